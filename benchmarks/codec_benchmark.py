@@ -0,0 +1,59 @@
+"""
+Compares bytes transferred and CPU time of S3Url codecs per compression level against moto-mocked S3.
+
+    pip install '.[dev,zstd]'
+    python benchmarks/codec_benchmark.py
+"""
+import json
+import os
+import random
+import time
+
+import boto3
+from moto import mock_aws
+
+from s3_url import S3Url
+
+BUCKET = 'benchmark-bucket'
+CODEC_LEVELS = [
+    (None, None),
+    ('gzip', 1), ('gzip', 6), ('gzip', 9),
+    ('zstd', 1), ('zstd', 3), ('zstd', 9), ('zstd', 19),
+]
+
+
+def sample_records(count: int) -> list:
+    rnd = random.Random(42)
+    return [{
+        'id': i,
+        'name': f'record-{i}',
+        'category': rnd.choice(['alpha', 'beta', 'gamma', 'delta']),
+        'value': rnd.random(),
+        'tags': rnd.sample(['a', 'b', 'c', 'd', 'e', 'f'], 3),
+    } for i in range(count)]
+
+
+def run(records: list) -> None:
+    raw_size = len(json.dumps(records, default=str).encode())
+    print(f'raw json size: {raw_size} bytes')
+    print(f'{"codec":<6} {"level":>5} {"bytes":>10} {"ratio":>6} {"write cpu s":>11} {"read cpu s":>10}')
+    for codec, level in CODEC_LEVELS:
+        url = S3Url(f's3://{BUCKET}/records-{codec}-{level}.json')
+        started = time.process_time()
+        url.write_json(records, codec=codec, level=level)
+        write_cpu = time.process_time() - started
+        started = time.process_time()
+        assert url.read_json(codec='auto') == records
+        read_cpu = time.process_time() - started
+        stored = url.object.content_length
+        print(f'{codec or "none":<6} {level if level is not None else "-":>5} {stored:>10} '
+              f'{stored / raw_size:>6.3f} {write_cpu:>11.3f} {read_cpu:>10.3f}')
+
+
+if __name__ == '__main__':
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    with mock_aws():
+        boto3.resource('s3').create_bucket(Bucket=BUCKET)
+        run(sample_records(int(os.environ.get('BENCHMARK_RECORDS', 200000))))
@@ -0,0 +1,61 @@
+"""
+Measures PrefixIndex memory and query time for synthetic keys (10M by default), compared to a plain list of str.
+
+    python benchmarks/prefix_index_benchmark.py
+    BENCHMARK_KEYS=1000000 python benchmarks/prefix_index_benchmark.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+from s3_url import PrefixIndex
+
+
+def generate_keys(count: int):
+    # time partitioned layout: events/<day>/<hour>/part-<n>.json, sorted
+    per_hour = max(1, count // (30 * 24))
+    generated = 0
+    for day in range(1, 31):
+        for hour in range(24):
+            for part in range(per_hour):
+                if generated == count:
+                    return
+                yield f'events/2024-05-{day:02d}/{hour:02d}/part-{part:08d}.json'
+                generated += 1
+
+
+def timed(title: str, func, repeat: int = 1000):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    print(f'{title:<40} {(time.perf_counter() - started) / repeat * 1e6:>10.1f} us')
+    return result
+
+
+def run(count: int) -> None:
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    tracemalloc.start()
+    index = PrefixIndex.from_keys('s3://benchmark-bucket/events/', generate_keys(count))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'keys: {len(index)}')
+    print(f'index size: {index.nbytes / 2 ** 20:.1f} MiB ({index.nbytes / len(index):.1f} bytes/key), '
+          f'build peak: {peak / 2 ** 20:.1f} MiB')
+
+    sample = list(generate_keys(min(count, 100000)))
+    list_size = sys.getsizeof(sample) + sum(sys.getsizeof(key) for key in sample)
+    print(f'list of str estimate: {list_size / len(sample) * count / 2 ** 20:.1f} MiB '
+          f'({list_size / len(sample):.1f} bytes/key)')
+
+    last_key = sample[-1]
+    timed('exists', lambda: index.exists(last_key))
+    timed('exists (missing)', lambda: index.exists('events/2024-05-15/12/missing.json'))
+    timed('keys of one hour', lambda: sum(1 for _ in index.keys('events/2024-05-15/12/')), repeat=10)
+    timed('children of one day', lambda: sum(1 for _ in index.children('events/2024-05-15/')), repeat=100)
+    timed('glob one hour of every day', lambda: sum(1 for _ in index.glob('events/2024-05-*/12/part-00000000.json')),
+          repeat=1)
+
+
+if __name__ == '__main__':
+    run(int(os.environ.get('BENCHMARK_KEYS', 10 * 1000 * 1000)))
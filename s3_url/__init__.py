@@ -1 +1,6 @@
 from s3_url.s3_url import S3Url
+from s3_url.s3_writer import S3Writer
+from s3_url.jsonl_sink import JsonLinesSink
+from s3_url.inventory import S3Inventory
+from s3_url.prefix_index import PrefixIndex
+from s3_url.usage import PrefixUsage, usage_report
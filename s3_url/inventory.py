@@ -0,0 +1,96 @@
+import csv
+import io
+import re
+from datetime import datetime
+from typing import Union, Iterable, List
+from urllib.parse import unquote_plus
+
+from s3_url.s3_url import S3Url
+
+_REPORT_FOLDER_RE = re.compile(r'^\d{4}-\d{2}-\d{2}T\d{2}-\d{2}Z/$')
+
+
+class S3Inventory():
+    '''
+    Listing backend reading S3 Inventory reports (CSV format), for prefixes too large to LIST.
+    Reflects bucket state at report creation time.
+    '''
+
+    def __init__(self, manifest_url: Union[str, S3Url]):
+        '''
+        Creates inventory instance
+        :param manifest_url: url of inventory manifest.json
+        '''
+        self._manifest_url = S3Url(manifest_url)
+        self._manifest = None
+
+    @classmethod
+    def latest(cls, inventory_url: Union[str, S3Url]) -> 'S3Inventory':
+        '''
+        Finds the most recent report of inventory configuration
+        :param inventory_url: inventory configuration prefix: s3://<destination>/<prefix>/<source bucket>/<config id>/
+        :return: inventory of the latest manifest.json
+        '''
+        inventory_url = S3Url(inventory_url)
+        inventory_prefix = S3Url.from_bucket_key(inventory_url.bucket, inventory_url._dir_prefix())
+        # only report folders are listed, named by creation time, e.g. 2024-05-17T01-00Z/, next to data/ and hive/
+        report_folders = sorted((folder for folder in inventory_prefix.list_common_prefixes()
+                                 if _REPORT_FOLDER_RE.match(folder.key[len(inventory_prefix.key):])),
+                                key=lambda folder: folder.key, reverse=True)
+        for folder in report_folders:
+            # manifest is written last, so report still being delivered has none yet
+            manifest_url = S3Url.from_bucket_key(folder.bucket, folder.key + 'manifest.json')
+            if manifest_url.exists():
+                return S3Inventory(manifest_url)
+        raise ValueError(f'No inventory manifests found in {inventory_url}')
+
+    @property
+    def manifest(self) -> dict:
+        if self._manifest is None:
+            self._manifest = self._manifest_url.read_json()
+        return self._manifest
+
+    @property
+    def source_bucket(self) -> str:
+        return self.manifest['sourceBucket']
+
+    @property
+    def file_schema(self) -> List[str]:
+        return [field.strip() for field in self.manifest['fileSchema'].split(',')]
+
+    def list_objects(self, prefix: str = '') -> Iterable[S3Url]:
+        '''
+        Streams inventory data files and yields current objects with key starting with prefix
+        :param prefix: key prefix
+        :return: iterable of object urls with size, etag, storage_class, last_modified from inventory
+        '''
+        if self.manifest.get('fileFormat', 'CSV').upper() != 'CSV':
+            raise ValueError(f'Unsupported inventory format: {self.manifest["fileFormat"]}, only CSV is supported')
+        schema = self.file_schema
+        destination_bucket = self.manifest['destinationBucket'].split(':')[-1]
+        for data_file in self.manifest['files']:
+            data_url = S3Url.from_bucket_key(destination_bucket, data_file['key'])
+            with data_url.open_read(codec='auto') as stream:
+                for row in csv.reader(io.TextIOWrapper(stream, encoding='utf-8', newline='')):
+                    record = dict(zip(schema, row))
+                    # keys are url-encoded in CSV inventories
+                    key = unquote_plus(record['Key'])
+                    if not key.startswith(prefix) or record.get('IsDeleteMarker') == 'true' \
+                            or record.get('IsLatest') == 'false':
+                        continue
+                    yield S3Url._from_summary(record.get('Bucket') or self.source_bucket,
+                                              self._summary(key, record))
+
+    @staticmethod
+    def _summary(key: str, record: dict) -> dict:
+        summary = {'Key': key}
+        if record.get('Size'):
+            summary['Size'] = int(record['Size'])
+        if record.get('ETag'):
+            etag = record['ETag'].strip('"')
+            summary['ETag'] = f'"{etag}"'
+        if record.get('StorageClass'):
+            summary['StorageClass'] = record['StorageClass']
+        if record.get('LastModifiedDate'):
+            summary['LastModified'] = datetime.fromisoformat(record['LastModifiedDate'].replace('Z', '+00:00'))
+        return summary
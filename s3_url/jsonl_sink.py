@@ -0,0 +1,221 @@
+import json
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Union, Optional, Any, List, Dict
+
+from s3_url.s3_url import S3Url, _compressobj
+
+_CODEC_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+_MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class _Part():
+    # single in-progress object, buffered body is streamed as multipart upload parts once it reaches part_size
+    def __init__(self, client, url: S3Url, partition: str, put_args: dict, part_size: int,
+                 codec: Optional[str] = None, level: Optional[int] = None):
+        self.url = url
+        self.partition = partition
+        self.lock = threading.Lock()
+        self.closed = False
+        self.records = 0
+        self.size = 0
+        self.opened_at = time.monotonic()
+        self._client = client
+        self._put_args = put_args
+        self._part_size = part_size
+        self._compressor = _compressobj(codec, level) if codec else None
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._uploaded_parts = []
+
+    def write(self, line: bytes) -> None:
+        try:
+            self._buffer += self._compressor.compress(line) if self._compressor else line
+            self.records += 1
+            self.size += len(line)
+            if len(self._buffer) >= self._part_size:
+                self._upload_part()
+        except BaseException:
+            self.abort()
+            raise
+
+    def close(self) -> dict:
+        self.closed = True
+        try:
+            if self._compressor:
+                self._buffer += self._compressor.flush()
+            if self._upload_id is None:
+                self._client.put_object(Bucket=self.url.bucket, Key=self.url.key, Body=bytes(self._buffer),
+                                        **self._put_args)
+            else:
+                if self._buffer:
+                    self._upload_part()
+                self._client.complete_multipart_upload(Bucket=self.url.bucket, Key=self.url.key,
+                                                       UploadId=self._upload_id,
+                                                       MultipartUpload={'Parts': self._uploaded_parts})
+        except BaseException:
+            self.abort()
+            raise
+        return {'url': self.url.url, 'partition': self.partition, 'records': self.records, 'size': self.size}
+
+    def abort(self) -> None:
+        self.closed = True
+        if self._upload_id is not None:
+            self._client.abort_multipart_upload(Bucket=self.url.bucket, Key=self.url.key, UploadId=self._upload_id)
+            self._upload_id = None
+
+    def _upload_part(self) -> None:
+        if self._upload_id is None:
+            self._upload_id = self._client.create_multipart_upload(
+                Bucket=self.url.bucket, Key=self.url.key, **self._put_args)['UploadId']
+        part_number = len(self._uploaded_parts) + 1
+        response = self._client.upload_part(Bucket=self.url.bucket, Key=self.url.key, UploadId=self._upload_id,
+                                            PartNumber=part_number, Body=bytes(self._buffer))
+        self._uploaded_parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+        self._buffer = bytearray()
+
+
+class JsonLinesSink():
+    '''
+    Appends records to JSON Lines objects under a prefix. Every partition has one in-progress object,
+    streamed as multipart upload and rolled over to a new key by size, record count or age.
+    Keys look like <prefix><partition>/part-<writer id>-<sequence>.jsonl[.gz|.zst], so any number of sinks
+    can write to the same partition concurrently. The sink itself is thread safe.
+    '''
+
+    def __init__(self, prefix: Union[str, S3Url], partition_template: str = '{dt:%Y-%m-%d/%H}',
+                 max_part_bytes: int = 128 * 1024 * 1024, max_records: Optional[int] = None,
+                 max_age_seconds: Optional[float] = None, codec: Optional[str] = None, level: Optional[int] = None,
+                 encryption=None, part_size: int = 8 * 1024 * 1024):
+        '''
+        Creates sink instance
+        :param prefix: prefix url objects are written under
+        :param partition_template: str.format template of partition path, gets record timestamp as "dt"
+            and record itself as "record", e.g. '{record[type]}/{dt:%Y/%m/%d}'
+        :param max_part_bytes: roll over once object gets this many (uncompressed) bytes
+        :param max_records: roll over once object gets this many records
+        :param max_age_seconds: roll over once object is open for this long, checked on write and by roll_expired
+        :param codec: "gzip" or "zstd" to compress objects, matching suffix is added to keys
+        :param level: compression level, codec default if not set
+        :param encryption: server side encryption
+        :param part_size: multipart upload part size, at least 5MB
+        '''
+        if part_size < _MIN_PART_SIZE:
+            raise ValueError(f'part_size must be at least {_MIN_PART_SIZE} bytes, got {part_size}')
+        if codec is not None:
+            # compressor is created right away, so unsupported codec or level fail here rather than on first write
+            _compressobj(codec, level)
+        self._prefix = S3Url(prefix)
+        self._partition_template = partition_template
+        self._max_part_bytes = max_part_bytes
+        self._max_records = max_records
+        self._max_age_seconds = max_age_seconds
+        self._codec = codec
+        self._level = level
+        self._part_size = part_size
+        self._client = self._prefix._resource.meta.client
+        self._put_args = self._prefix._put_args(encryption)
+        self._writer_id = uuid.uuid4().hex[:12]
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._open_parts: Dict[str, _Part] = {}
+        self._manifest: List[dict] = []
+        self._closed = False
+
+    def __enter__(self) -> 'JsonLinesSink':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    @property
+    def manifest(self) -> List[dict]:
+        '''
+        Completed objects so far: dicts with url, partition, records and (uncompressed) size
+        '''
+        with self._lock:
+            return list(self._manifest)
+
+    def write(self, record: Any, timestamp: Optional[datetime] = None) -> None:
+        '''
+        Appends record to in-progress object of its partition
+        :param record: json serializable record
+        :param timestamp: record time used for partitioning, current UTC time if not set
+        '''
+        timestamp = timestamp or datetime.now(timezone.utc)
+        partition = self._partition_template.format(dt=timestamp, record=record).strip('/')
+        line = (json.dumps(record, default=str) + '\n').encode()
+        while True:
+            part = self._get_part(partition)
+            with part.lock:
+                if part.closed:
+                    continue
+                try:
+                    part.write(line)
+                finally:
+                    if part.closed:
+                        self._discard(part)
+                if self._is_full(part):
+                    self._complete(part)
+                return
+
+    def roll_expired(self) -> None:
+        '''
+        Completes in-progress objects older than max_age_seconds, to be called periodically when writes are rare
+        '''
+        with self._lock:
+            parts = list(self._open_parts.values())
+        for part in parts:
+            with part.lock:
+                if not part.closed and self._is_expired(part):
+                    self._complete(part)
+
+    def close(self) -> List[dict]:
+        '''
+        Completes all in-progress objects, further writes are refused
+        :return: manifest of all objects completed by the sink
+        '''
+        with self._lock:
+            self._closed = True
+            parts = list(self._open_parts.values())
+        for part in parts:
+            with part.lock:
+                if not part.closed:
+                    self._complete(part)
+        return self.manifest
+
+    def _get_part(self, partition: str) -> _Part:
+        with self._lock:
+            part = self._open_parts.get(partition)
+            if part is None:
+                if self._closed:
+                    raise RuntimeError('Cannot write to closed sink')
+                self._sequence += 1
+                key = f'{self._prefix._dir_prefix()}{partition}/part-{self._writer_id}-{self._sequence:05d}.jsonl' \
+                      f'{_CODEC_SUFFIXES.get(self._codec, "")}'
+                part = _Part(self._client, S3Url.from_bucket_key(self._prefix.bucket, key), partition,
+                             self._put_args, self._part_size, self._codec, self._level)
+                self._open_parts[partition] = part
+            return part
+
+    def _is_full(self, part: _Part) -> bool:
+        return part.size >= self._max_part_bytes \
+            or (self._max_records is not None and part.records >= self._max_records) \
+            or self._is_expired(part)
+
+    def _is_expired(self, part: _Part) -> bool:
+        return self._max_age_seconds is not None and time.monotonic() - part.opened_at >= self._max_age_seconds
+
+    def _discard(self, part: _Part) -> None:
+        with self._lock:
+            if self._open_parts.get(part.partition) is part:
+                del self._open_parts[part.partition]
+
+    def _complete(self, part: _Part) -> None:
+        # called with part lock held, so the part is closed by one thread only
+        self._discard(part)
+        entry = part.close()
+        with self._lock:
+            self._manifest.append(entry)
@@ -0,0 +1,218 @@
+import re
+from array import array
+from bisect import bisect_left
+from fnmatch import translate
+from typing import Union, Iterable, Optional, Tuple
+
+from s3_url.s3_url import S3Url
+
+# utf-8 never contains 0xff byte, so prefix + 0xff sorts after every key starting with prefix
+_PREFIX_END = b'\xff'
+
+
+class _SortedKeys():
+    # sorted utf-8 keys packed in a single buffer with offsets array, ~key length + 8 bytes per key
+    __slots__ = ('_blob', '_offsets')
+
+    def __init__(self, blob: Optional[bytearray] = None, offsets: Optional[array] = None):
+        self._blob = blob if blob is not None else bytearray()
+        self._offsets = offsets if offsets is not None else array('Q', [0])
+
+    @classmethod
+    def from_keys(cls, keys: Iterable[bytes]) -> '_SortedKeys':
+        sorted_keys = cls()
+        sorted_keys.extend(keys)
+        return sorted_keys
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> bytes:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return bytes(self._blob[self._offsets[index]:self._offsets[index + 1]])
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._blob) + self._offsets.itemsize * len(self._offsets)
+
+    def extend(self, keys: Iterable[bytes]) -> None:
+        for key in keys:
+            self._blob += key
+            self._offsets.append(len(self._blob))
+
+    def splice(self, start: int, end: int, keys: Iterable[bytes]) -> '_SortedKeys':
+        # returns copy with keys[start:end] replaced
+        result = _SortedKeys(self._blob[:self._offsets[start]], self._offsets[:start + 1])
+        result.extend(keys)
+        shift = len(result._blob) - self._offsets[end]
+        result._blob += self._blob[self._offsets[end]:]
+        result._offsets.extend(offset + shift for offset in self._offsets[end + 1:])
+        return result
+
+    def range(self, start: int, end: int) -> Iterable[bytes]:
+        for index in range(start, end):
+            yield self[index]
+
+
+class PrefixIndex():
+    '''
+    In-memory snapshot of keys under a prefix, built from one listing, answering existence, prefix, range,
+    glob and child queries without S3 requests.
+    Keys are bucket keys (same as S3Url.key), sorted in utf-8 byte order like S3 listings.
+    '''
+
+    def __init__(self, prefix: Union[str, S3Url]):
+        '''
+        Creates empty index, use build or refresh to fill it
+        :param prefix: prefix url to index
+        '''
+        self._prefix = S3Url(prefix)
+        self._keys = _SortedKeys()
+
+    @classmethod
+    def build(cls, prefix: Union[str, S3Url]) -> 'PrefixIndex':
+        '''
+        Creates index from a single listing of the prefix
+        :param prefix: prefix url to index
+        :return: index instance
+        '''
+        index = cls(prefix)
+        index.refresh()
+        return index
+
+    @classmethod
+    def from_keys(cls, prefix: Union[str, S3Url], keys: Iterable[str]) -> 'PrefixIndex':
+        '''
+        Creates index from already known keys, e.g. from S3 Inventory
+        :param prefix: prefix url the keys belong to
+        :param keys: bucket keys, sorted if not already, duplicates are stored once
+        :return: index instance
+        '''
+        index = cls(prefix)
+        sorted_keys = _SortedKeys()
+        previous = b''
+        keys = iter(keys)
+        for key in keys:
+            encoded = key.encode()
+            if encoded < previous:
+                # unsorted input - collected and sorted, sorted input is packed as it streams in
+                remaining = [encoded] + [key.encode() for key in keys]
+                remaining.extend(sorted_keys.range(0, len(sorted_keys)))
+                sorted_keys = _SortedKeys.from_keys(sorted(set(remaining)))
+                break
+            if encoded == previous and len(sorted_keys):
+                continue
+            sorted_keys.extend([encoded])
+            previous = encoded
+        index._keys = sorted_keys
+        return index
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: Union[str, S3Url]) -> bool:
+        return self.exists(key)
+
+    @property
+    def nbytes(self) -> int:
+        '''
+        Memory used by key storage
+        '''
+        return self._keys.nbytes
+
+    def refresh(self) -> int:
+        '''
+        Adds keys listed after the last indexed key (StartAfter watermark),
+        picks up new keys only when they sort after existing ones, e.g. time-ordered keys
+        :return: number of added keys
+        '''
+        watermark = self._keys[-1].decode() if len(self._keys) else None
+        before = len(self._keys)
+        self._keys.extend(summary['Key'].encode()
+                          for summary in self._prefix._list_object_summaries(start_after=watermark))
+        return len(self._keys) - before
+
+    def refresh_prefix(self, prefix: str) -> int:
+        '''
+        Re-lists sub-prefix and replaces its keys, picks up new and deleted keys in it
+        :param prefix: sub-prefix key, must be under the index prefix
+        :return: number of keys under the sub-prefix
+        '''
+        if not prefix.startswith(self._prefix.key):
+            raise ValueError(f'{prefix} is not under index prefix {self._prefix.key}')
+        start, end = self._bounds(prefix)
+        listed = [summary['Key'].encode() for summary in self._prefix._list_object_summaries(prefix)]
+        self._keys = self._keys.splice(start, end, listed)
+        return len(listed)
+
+    def exists(self, key: Union[str, S3Url]) -> bool:
+        encoded = self._key(key).encode()
+        index = bisect_left(self._keys, encoded)
+        return index < len(self._keys) and self._keys[index] == encoded
+
+    def keys(self, prefix: Optional[str] = None) -> Iterable[str]:
+        start, end = self._bounds(self._prefix.key if prefix is None else prefix)
+        for key in self._keys.range(start, end):
+            yield key.decode()
+
+    def range(self, start_key: str, end_key: Optional[str] = None) -> Iterable[str]:
+        '''
+        Keys in [start_key, end_key) range, till the end if end_key is not set
+        '''
+        start = bisect_left(self._keys, start_key.encode())
+        end = bisect_left(self._keys, end_key.encode()) if end_key is not None else len(self._keys)
+        for key in self._keys.range(start, end):
+            yield key.decode()
+
+    def list_prefix_objects(self, prefix: Optional[str] = None) -> Iterable[S3Url]:
+        for key in self.keys(prefix):
+            yield S3Url.from_bucket_key(self._prefix.bucket, key)
+
+    def glob(self, pattern: str) -> Iterable[S3Url]:
+        '''
+        Objects with keys matching fnmatch pattern, only keys sharing the literal part before first wildcard are scanned
+        :param pattern: key pattern, e.g. "logs/2024-*/app.log"
+        '''
+        literal_prefix = pattern
+        for wildcard in '*?[':
+            literal_prefix = literal_prefix.split(wildcard, 1)[0]
+        matcher = re.compile(translate(pattern))
+        for key in self.keys(literal_prefix):
+            if matcher.match(key):
+                yield S3Url.from_bucket_key(self._prefix.bucket, key)
+
+    def children(self, prefix: Optional[str] = None, delimiter: str = '/') -> Iterable[S3Url]:
+        '''
+        Direct children of prefix - objects and sub-prefixes (ending with delimiter), in key order.
+        Keys inside a sub-prefix are skipped with a single bisect
+        '''
+        prefix = self._prefix.key if prefix is None else prefix
+        index, end = self._bounds(prefix)
+        encoded_prefix = prefix.encode()
+        encoded_delimiter = delimiter.encode()
+        while index < end:
+            key = self._keys[index]
+            position = key.find(encoded_delimiter, len(encoded_prefix))
+            if position == -1:
+                yield S3Url.from_bucket_key(self._prefix.bucket, key.decode())
+                index += 1
+            else:
+                child = key[:position + len(encoded_delimiter)]
+                yield S3Url.from_bucket_key(self._prefix.bucket, child.decode())
+                index = bisect_left(self._keys, child + _PREFIX_END, index, end)
+
+    def list_common_prefixes(self, prefix: Optional[str] = None) -> Iterable[S3Url]:
+        for child in self.children(prefix):
+            if child.key.endswith('/'):
+                yield child
+
+    def _bounds(self, prefix: str) -> Tuple[int, int]:
+        encoded = prefix.encode()
+        return bisect_left(self._keys, encoded), bisect_left(self._keys, encoded + _PREFIX_END)
+
+    @staticmethod
+    def _key(key: Union[str, S3Url]) -> str:
+        return key.key if isinstance(key, S3Url) else key
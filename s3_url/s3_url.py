@@ -1,17 +1,292 @@
+import csv
+import base64
+import gzip
+import io
+import operator
 import os
+import re
+import shutil
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from fnmatch import fnmatch
+from hashlib import md5
 from io import IOBase
 import json
+import tempfile
 import threading
-from pathlib import Path
-from typing import Union, Iterable, IO, Any
-from urllib.parse import urlparse
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from typing import Union, Iterable, IO, Any, Optional, Dict, List, Set, Tuple, TYPE_CHECKING
+from urllib.parse import urlparse, urlencode
 
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError
+from s3transfer.utils import ChunksizeAdjuster
+
+from s3_url.usage import PrefixUsage
+
+if TYPE_CHECKING:
+    # imported for annotations only, inventory module imports this one
+    from s3_url.inventory import S3Inventory
+
+_SUFFIX_CODECS = {'.gz': 'gzip', '.gzip': 'gzip', '.zst': 'zstd', '.zstd': 'zstd'}
+_MIB = 1024 * 1024
+_MAX_CHUNKSIZE_CANDIDATES = 8
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError as err:
+        raise ImportError('zstd codec requires zstandard package, install s3_url_helper[zstd]') from err
+    return zstandard
+
+
+def _resolve_codec(codec: Optional[str], key: str, content_encoding: Optional[str] = None) -> Optional[str]:
+    if codec != 'auto':
+        return codec
+    if content_encoding in _SUFFIX_CODECS.values():
+        return content_encoding
+    return _SUFFIX_CODECS.get(PurePosixPath(key).suffix.lower())
+
+
+def _compressobj(codec: str, level: Optional[int] = None):
+    if codec == 'gzip':
+        level = zlib.Z_DEFAULT_COMPRESSION if level is None else level
+        return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    if codec == 'zstd':
+        return _zstandard().ZstdCompressor(level=3 if level is None else level).compressobj()
+    raise ValueError(f'Unsupported codec: {codec}')
+
+
+def _decompressing_stream(codec: str, fileobj: IO[bytes]) -> IO[bytes]:
+    if codec == 'gzip':
+        return gzip.GzipFile(fileobj=fileobj, mode='rb')
+    if codec == 'zstd':
+        # zstd reader doesn't support readline and line iteration, buffering makes it behave like gzip stream
+        return io.BufferedReader(_zstandard().ZstdDecompressor().stream_reader(fileobj))
+    raise ValueError(f'Unsupported codec: {codec}')
+
+
+class _CompressingReader(io.RawIOBase):
+    # compresses source file object on the fly, so it can be uploaded without a compressed copy in memory
+    def __init__(self, fileobj: IO, codec: str, level: Optional[int] = None, chunk_size: int = 1024 * 1024):
+        self._fileobj = fileobj
+        self._compressor = _compressobj(codec, level)
+        self._chunk_size = chunk_size
+        self._buffer = b''
+        self._eof = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._buffer and not self._eof:
+            chunk = self._fileobj.read(self._chunk_size)
+            if chunk:
+                self._buffer = self._compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+            else:
+                self._buffer = self._compressor.flush()
+                self._eof = True
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+class _SelectQuery():
+    # client side evaluation of a subset of S3 Select SQL:
+    # SELECT * | col[, col...] FROM S3Object [[AS] alias] [WHERE col op literal [AND ...]] [LIMIT n]
+    _QUERY_RE = re.compile(
+        r'^\s*SELECT\s+(?P<columns>.+?)\s+FROM\s+S3Object(?:\[\*\])?'
+        r'(?:\s+(?:AS\s+)?(?P<alias>(?!WHERE\b|LIMIT\b)\w+))?'
+        r'(?:\s+WHERE\s+(?P<where>.+?))?(?:\s+LIMIT\s+(?P<limit>\d+))?\s*;?\s*$',
+        re.IGNORECASE | re.DOTALL)
+    _CONDITION_RE = re.compile(
+        r'\s*(?P<column>[\w.]+|(?:\w+\.)?"[^"]+")\s*(?P<op>=|!=|<>|<=|>=|<|>)\s*'
+        r'(?P<value>\'(?:[^\']|\'\')*\'|-?\d+(?:\.\d+)?)\s*')
+    _AND_RE = re.compile(r'AND\b', re.IGNORECASE)
+    _COLUMN_RE = re.compile(r'^(?:(?P<qualifier>\w+)\.)?(?:(?P<name>\w+)|"(?P<quoted>[^"]+)")$')
+    _OPERATORS = {'=': operator.eq, '!=': operator.ne, '<>': operator.ne,
+                  '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+
+    def __init__(self, expression: str):
+        match = self._QUERY_RE.match(expression)
+        if not match:
+            raise ValueError(f'Expression is not supported by client side evaluation: {expression}')
+        self._alias = (match.group('alias') or 'S3Object').lower()
+        columns = match.group('columns').strip()
+        self.columns = None if columns == '*' else [self._column_name(c, expression) for c in columns.split(',')]
+        self.conditions = self._parse_conditions(match.group('where') or '', expression)
+        self.limit = int(match.group('limit')) if match.group('limit') else None
+
+    def _column_name(self, column: str, expression: str) -> str:
+        # only plain columns, optionally qualified by alias: functions, AS, CAST or arithmetic would be misread
+        match = self._COLUMN_RE.match(column.strip())
+        qualifier = match.group('qualifier') if match else None
+        if not match or (qualifier and qualifier.lower() not in (self._alias, 's3object')):
+            raise ValueError(f'Expression is not supported by client side evaluation: {expression}')
+        return match.group('name') or match.group('quoted')
+
+    def _parse_conditions(self, where: str, expression: str) -> List[Tuple[str, Any, Any]]:
+        conditions = []
+        pos = 0
+        while pos < len(where):
+            match = self._CONDITION_RE.match(where, pos)
+            if not match:
+                raise ValueError(f'Expression is not supported by client side evaluation: {expression}')
+            value = match.group('value')
+            if value.startswith("'"):
+                value = value[1:-1].replace("''", "'")
+            else:
+                value = float(value)
+            column = self._column_name(match.group('column'), expression)
+            conditions.append((column, self._OPERATORS[match.group('op')], value))
+            pos = match.end()
+            if pos < len(where):
+                and_match = self._AND_RE.match(where, pos)
+                if not and_match:
+                    raise ValueError(f'Expression is not supported by client side evaluation: {expression}')
+                pos = and_match.end()
+        return conditions
+
+    def matches(self, record: dict) -> bool:
+        for column, compare, value in self.conditions:
+            actual = record.get(column)
+            if actual is None:
+                return False
+            try:
+                if isinstance(value, float):
+                    actual = float(actual)
+                elif not isinstance(actual, str):
+                    actual = str(actual)
+                if not compare(actual, value):
+                    return False
+            except (TypeError, ValueError):
+                return False
+        return True
+
+    def project(self, record: dict) -> dict:
+        if self.columns is None:
+            return record
+        return {column: record[column] for column in self.columns if column in record}
+
+    def row(self, record: dict) -> List[Any]:
+        # selected columns keep their positions, missing ones are empty like in S3 Select CSV output
+        if self.columns is None:
+            return list(record.values())
+        return [record.get(column, '') for column in self.columns]
+
+    def evaluate(self, records: Iterable[dict]) -> Iterable[dict]:
+        count = 0
+        for record in records:
+            if self.limit is not None and count >= self.limit:
+                return
+            if self.matches(record):
+                count += 1
+                yield self.project(record)
+
+
+def _walk_files(local_path: Union[str, Path], include: Optional[Iterable[str]],
+                exclude: Optional[Iterable[str]]) -> Iterable[Tuple[Path, str]]:
+    root = Path(local_path)
+    for dir_path, _, file_names in os.walk(root):
+        for file_name in sorted(file_names):
+            path = Path(dir_path) / file_name
+            rel_path = path.relative_to(root).as_posix()
+            if include and not any(fnmatch(rel_path, pattern) for pattern in include):
+                continue
+            if exclude and any(fnmatch(rel_path, pattern) for pattern in exclude):
+                continue
+            yield path, rel_path
+
+
+def _stream_etag(fileobj: IO[bytes], multipart_chunksize: Optional[int] = None) -> str:
+    # plain md5 for single-part uploads, md5 of part md5s suffixed with part count for multipart ones
+    if not multipart_chunksize:
+        digest = md5()
+        for chunk in iter(lambda: fileobj.read(1024 * 1024), b''):
+            digest.update(chunk)
+        return f'"{digest.hexdigest()}"'
+    part_digests = [md5(chunk).digest() for chunk in iter(lambda: fileobj.read(multipart_chunksize), b'')]
+    return f'"{md5(b"".join(part_digests)).hexdigest()}-{len(part_digests)}"'
+
+
+def _multipart_chunksizes(remote_etag: str, size: int, preferred_chunksize: int) -> List[int]:
+    # part size isn't kept in multipart ETag, only part count, so part sizes giving that count are tried:
+    # the configured one first, then whole MiB sizes used by most uploaders, up to _MAX_CHUNKSIZE_CANDIDATES
+    try:
+        parts = int(remote_etag.strip('"').rsplit('-', 1)[1])
+    except ValueError:
+        return []
+    if parts < 1:
+        return []
+    if parts == 1:
+        # any part size not smaller than object gives the same ETag
+        return [max(size, 1)]
+    min_chunksize = -(-size // parts)
+    max_chunksize = (size - 1) // (parts - 1)
+    candidates = [preferred_chunksize] if min_chunksize <= preferred_chunksize <= max_chunksize else []
+    first_mib = -(-min_chunksize // _MIB) * _MIB
+    for chunksize in range(first_mib, max_chunksize + 1, _MIB):
+        if len(candidates) >= _MAX_CHUNKSIZE_CANDIDATES:
+            break
+        if chunksize != preferred_chunksize:
+            candidates.append(chunksize)
+    return candidates or [min_chunksize]
+
+
+def _etag_matches(fileobj: IO[bytes], size: int, remote_etag: str, preferred_chunksize: int) -> bool:
+    if '-' not in remote_etag:
+        return _stream_etag(fileobj) == remote_etag
+    start = fileobj.tell()
+    preferred_chunksize = ChunksizeAdjuster().adjust_chunksize(preferred_chunksize, size)
+    for chunksize in _multipart_chunksizes(remote_etag, size, preferred_chunksize):
+        fileobj.seek(start)
+        if _stream_etag(fileobj, chunksize) == remote_etag:
+            return True
+    return False
+
+
+def _is_unchanged(path: Path, remote: Optional[dict], transfer_config: TransferConfig) -> bool:
+    if not remote:
+        return False
+    size = path.stat().st_size
+    if remote['Size'] != size:
+        return False
+    with path.open('rb') as fobj:
+        return _etag_matches(fobj, size, remote['ETag'], transfer_config.multipart_chunksize)
+
+
+class _ByteBudget():
+    def __init__(self, max_bytes: int):
+        self._max_bytes = max_bytes
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, size: int) -> int:
+        # a single object larger than the whole budget is let through alone
+        size = min(size, self._max_bytes)
+        with self._condition:
+            self._condition.wait_for(lambda: self._in_flight + size <= self._max_bytes)
+            self._in_flight += size
+        return size
+
+    def release(self, size: int) -> None:
+        with self._condition:
+            self._in_flight -= size
+            self._condition.notify_all()
 
 
 class S3Url():
     _local = threading.local()
+    _bucket_regions: Dict[str, str] = {}
+    # buckets which don't exist, default client is used for them without further lookups
+    _unresolved_buckets: Set[str] = set()
+    _bucket_regions_lock = threading.Lock()
+    # boto3 default session is not thread safe, so resources are created one at a time
+    _resource_lock = threading.Lock()
 
     def __init__(self, url: Union[str, 'S3Url']):
         '''
@@ -19,15 +294,14 @@ class S3Url():
         :param url: "s3://"-shaped url or another S3Url object
         '''
 
-        if not hasattr(self._local, 's3_res'):
-            self._local.s3_res = boto3.resource('s3')
         if isinstance(url, S3Url):
             url = url.url
         else:
             if not url.startswith('s3://'):
                 raise ValueError(f'Unsupported URL: {url}. It must start with s3://')
         self._parsed = urlparse(url, allow_fragments=False)
-        self._object = self._local.s3_res.Object(self.bucket, self.key)
+        self._object = None
+        self._summary = None
 
     @classmethod
     def from_url(cls, url: Union[str, 'S3Url']) -> 'S3Url':
@@ -37,6 +311,13 @@ class S3Url():
     def from_bucket_key(cls, bucket: str, key: str) -> 'S3Url':
         return S3Url(f's3://{bucket}/{key}')
 
+    @classmethod
+    def _from_summary(cls, bucket: str, summary: dict) -> 'S3Url':
+        # summary is listing entry with Key, Size, ETag, StorageClass and LastModified
+        url = S3Url.from_bucket_key(bucket, summary['Key'])
+        url._summary = summary
+        return url
+
     def __repr__(self) -> str:
         return self.url
 
@@ -56,12 +337,119 @@ class S3Url():
 
     @property
     def object(self):
+        if self._object is None:
+            self._object = self._resource.Object(self.bucket, self.key)
         return self._object
 
     @property
     def url(self) -> str:
         return self._parsed.geturl()
 
+    @property
+    def size(self) -> int:
+        '''
+        Object size, taken from listing metadata for listed urls, HEAD request otherwise
+        '''
+        return self._summary_value('Size', 'content_length')
+
+    @property
+    def etag(self) -> str:
+        return self._summary_value('ETag', 'e_tag')
+
+    @property
+    def storage_class(self) -> str:
+        # HEAD doesn't return storage class for STANDARD objects
+        return self._summary_value('StorageClass', 'storage_class') or 'STANDARD'
+
+    @property
+    def last_modified(self) -> datetime:
+        return self._summary_value('LastModified', 'last_modified')
+
+    def _summary_value(self, summary_field: str, object_attribute: str) -> Any:
+        if self._summary and summary_field in self._summary:
+            return self._summary[summary_field]
+        return getattr(self.object, object_attribute)
+
+    @property
+    def _resource(self):
+        return self._resource_for_bucket(self.bucket)
+
+    @classmethod
+    def _default_resource(cls):
+        if not hasattr(cls._local, 's3_res'):
+            with cls._resource_lock:
+                cls._local.s3_res = boto3.resource('s3')
+            cls._local.s3_res_by_region = {}
+        return cls._local.s3_res
+
+    @classmethod
+    def _resource_for_bucket(cls, bucket: str):
+        default_res = cls._default_resource()
+        region = cls.get_bucket_region(bucket)
+        if not region or region == default_res.meta.client.meta.region_name:
+            return default_res
+        regional_res = cls._local.s3_res_by_region.get(region)
+        if regional_res is None:
+            with cls._resource_lock:
+                regional_res = boto3.resource('s3', region_name=region)
+            cls._local.s3_res_by_region[region] = regional_res
+        return regional_res
+
+    @classmethod
+    def get_bucket_region(cls, bucket: str) -> Optional[str]:
+        '''
+        Returns region of the bucket, discovered once via HeadBucket and cached for the process lifetime
+        :param bucket: bucket name
+        :return: region name or None if it can't be determined (default client region is used then),
+            lookup of missing bucket is not repeated in the same process, other failures are retried on next call
+        '''
+        with cls._bucket_regions_lock:
+            region = cls._bucket_regions.get(bucket)
+            unresolved = bucket in cls._unresolved_buckets
+        if region or unresolved:
+            return region
+        try:
+            response = cls._default_resource().meta.client.head_bucket(Bucket=bucket)
+        except ClientError as cerr:
+            response = cerr.response
+        region = response.get('BucketRegion') or \
+            response.get('ResponseMetadata', {}).get('HTTPHeaders', {}).get('x-amz-bucket-region')
+        if region:
+            cls.set_bucket_region(bucket, region)
+        elif str(response.get('Error', {}).get('Code')) in ('404', 'NoSuchBucket'):
+            # throttling, server or credential errors are transient, so only missing bucket is remembered
+            with cls._bucket_regions_lock:
+                cls._unresolved_buckets.add(bucket)
+        return region
+
+    @classmethod
+    def set_bucket_region(cls, bucket: str, region: str) -> None:
+        with cls._bucket_regions_lock:
+            cls._bucket_regions[bucket] = region
+            cls._unresolved_buckets.discard(bucket)
+
+    @classmethod
+    def save_bucket_regions(cls, path: Union[str, Path]) -> None:
+        '''
+        Persists discovered bucket regions to a json file, so they can be reused by another run
+        :param path: local file path
+        '''
+        with cls._bucket_regions_lock:
+            regions = dict(cls._bucket_regions)
+        Path(path).write_text(json.dumps(regions, indent=2, sort_keys=True))
+
+    @classmethod
+    def load_bucket_regions(cls, path: Union[str, Path]) -> None:
+        '''
+        Loads bucket regions saved by save_bucket_regions, missing file is ignored
+        :param path: local file path
+        '''
+        path = Path(path)
+        if path.exists():
+            regions = json.loads(path.read_text())
+            with cls._bucket_regions_lock:
+                cls._bucket_regions.update(regions)
+
     def exists(self) -> bool:
         try:
             self.object.load()
@@ -74,7 +462,7 @@ class S3Url():
 
     def prefix_exists(self) -> bool:
         try:
-            next(iter(self._object.Bucket().objects.filter(Prefix=self.key)))
+            next(iter(self.object.Bucket().objects.filter(Prefix=self.key)))
             return True
         except StopIteration:
             return False
@@ -84,46 +472,401 @@ class S3Url():
             else:
                 raise cerr
 
-    def read_text(self, encoding="utf-8-sig") -> str:
-        return self.read().decode(encoding)
+    def read_text(self, encoding="utf-8-sig", codec: Optional[str] = None) -> str:
+        return self.read(codec).decode(encoding)
 
-    def read(self) -> bytes:
-        return self.object.get()['Body'].read()
+    def read(self, codec: Optional[str] = None) -> bytes:
+        '''
+        Reads object content
+        :param codec: "gzip", "zstd" or "auto" to detect it from ContentEncoding or key suffix,
+            no decompression if not set
+        :return: object content
+        '''
+        with self.open_read(codec) as stream:
+            return stream.read()
 
-    def read_json(self, encoding="utf-8-sig") -> Any:
-        return json.loads(self.read_text(encoding))
+    def open_read(self, codec: Optional[str] = None) -> IO[bytes]:
+        '''
+        Opens object content stream, decompressed incrementally when codec is set
+        :param codec: "gzip", "zstd" or "auto" to detect it from ContentEncoding or key suffix,
+            no decompression if not set
+        :return: binary file-like object
+        '''
+        response = self.object.get()
+        codec = _resolve_codec(codec, self.key, response.get('ContentEncoding'))
+        if codec:
+            return _decompressing_stream(codec, response['Body'])
+        return response['Body']
+
+    def read_json(self, encoding="utf-8-sig", codec: Optional[str] = None) -> Any:
+        return json.loads(self.read_text(encoding, codec))
+
+    def select(self, expression: str, input_format: str = 'json', output_format: str = 'json',
+               csv_header: str = 'USE', codec: Optional[str] = None, server_side: bool = True) -> Iterable[Any]:
+        '''
+        Queries CSV or JSON Lines object with S3 Select SQL, records are parsed and yielded as they stream in.
+        Falls back to client side streaming evaluation of simple queries
+        (projection, WHERE conditions joined by AND, LIMIT) when S3 Select is unavailable
+        :param expression: S3 Select SQL expression
+        :param input_format: "json" (JSON Lines) or "csv"
+        :param output_format: "json" to yield dicts or "csv" to yield lists of values
+        :param csv_header: csv FileHeaderInfo - "USE", "IGNORE" or "NONE" (columns are referenced as _1, _2, ...)
+        :param codec: "gzip" or "auto" for compressed objects, zstd objects are always evaluated client side
+        :param server_side: use S3 Select, evaluate client side if False
+        :return: iterable of records
+        '''
+        if input_format not in ('json', 'csv') or output_format not in ('json', 'csv'):
+            raise ValueError(f'Unsupported select formats: {input_format}, {output_format}')
+        if csv_header not in ('USE', 'IGNORE', 'NONE'):
+            raise ValueError(f'Unsupported csv header info: {csv_header}')
+        if codec not in (None, 'auto', 'gzip', 'zstd'):
+            raise ValueError(f'Unsupported codec: {codec}')
+        if codec == 'auto':
+            # HEAD only when key suffix doesn't tell the codec
+            codec = _resolve_codec(codec, self.key) or _resolve_codec(codec, self.key, self.object.content_encoding)
+        server_side = server_side and codec in (None, 'gzip')
+        # expression is parsed right away when it is evaluated client side for sure, so errors are raised here
+        query = None if server_side else _SelectQuery(expression)
+        return self._select(expression, input_format, output_format, csv_header, codec, query)
+
+    def _select(self, expression: str, input_format: str, output_format: str, csv_header: str,
+                codec: Optional[str], query: Optional[_SelectQuery]) -> Iterable[Any]:
+        if query is None:
+            try:
+                response = self._resource.meta.client.select_object_content(
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    Expression=expression,
+                    ExpressionType='SQL',
+                    InputSerialization={
+                        **({'JSON': {'Type': 'LINES'}} if input_format == 'json'
+                           else {'CSV': {'FileHeaderInfo': csv_header}}),
+                        'CompressionType': 'GZIP' if codec else 'NONE',
+                    },
+                    OutputSerialization={'JSON': {'RecordDelimiter': '\n'}} if output_format == 'json'
+                    else {'CSV': {'RecordDelimiter': '\n'}})
+            except ClientError as cerr:
+                if cerr.response['Error']['Code'] not in ('NotImplemented', 'MethodNotAllowed', 'UnsupportedOperation'):
+                    raise cerr
+            else:
+                yield from self._parse_select_payload(response['Payload'], output_format)
+                return
+            query = _SelectQuery(expression)
+        for record in query.evaluate(self._read_records(input_format, csv_header, codec)):
+            yield record if output_format == 'json' else query.row(record)
+
+    @staticmethod
+    def _parse_select_payload(payload: Iterable[dict], output_format: str) -> Iterable[Any]:
+        lines = S3Url._select_payload_lines(payload)
+        if output_format == 'csv':
+            # quoted fields can contain newlines, so one reader parses rows across lines
+            yield from (row for row in csv.reader(lines) if row)
+            return
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+
+    @staticmethod
+    def _select_payload_lines(payload: Iterable[dict]) -> Iterable[str]:
+        # records can be split between events, so only complete lines are yielded
+        pending = b''
+        for event in payload:
+            if 'Records' not in event:
+                continue
+            lines = (pending + event['Records']['Payload']).split(b'\n')
+            pending = lines.pop()
+            for line in lines:
+                yield line.decode() + '\n'
+        if pending:
+            yield pending.decode()
+
+    def _read_records(self, input_format: str, csv_header: str, codec: Optional[str]) -> Iterable[dict]:
+        with self.open_read(codec) as stream:
+            text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='' if input_format == 'csv' else None)
+            if input_format == 'json':
+                for line in text:
+                    if line.strip():
+                        yield json.loads(line)
+                return
+            reader = csv.reader(text)
+            header = next(reader, None) if csv_header in ('USE', 'IGNORE') else None
+            for row in reader:
+                if csv_header == 'USE':
+                    yield dict(zip(header, row))
+                else:
+                    yield {f'_{i}': value for i, value in enumerate(row, 1)}
 
     def delete(self) -> None:
         self.object.delete()
 
-    def write(self, body: Union[str, bytes], encryption=None) -> None:
-        if encryption:
-            self.object.put(Body=body, ServerSideEncryption=encryption)
-        else:
-            self.object.put(Body=body)
-
-    def write_text(self, body: str, encryption=None) -> None:
-        self.write(body, encryption)
+    def write(self, body: Union[str, bytes], encryption=None, codec: Optional[str] = None,
+              level: Optional[int] = None, tags: Optional[dict] = None, skip_unchanged: bool = False) -> bool:
+        '''
+        Writes object content
+        :param body: content to write
+        :param encryption: server side encryption
+        :param codec: "gzip", "zstd" or "auto" to detect it from key suffix, no compression if not set
+        :param level: compression level, codec default if not set
+        :param tags: object tags, set in the same request
+        :param skip_unchanged: don't write if md5 of the body matches remote ETag (tags are not compared),
+            body is sent with Content-MD5 so S3 verifies its integrity
+        :return: True if object was written, False if skipped
+        '''
+        body = self._encode_body(body, codec, level)
+        put_args = self._put_args(encryption, codec, tags)
+        if skip_unchanged:
+            body = body.encode() if isinstance(body, str) else body
+            digest = md5(body)
+            if self._remote_etag() == f'"{digest.hexdigest()}"':
+                return False
+            put_args['ContentMD5'] = base64.b64encode(digest.digest()).decode()
+        self.object.put(Body=body, **put_args)
+        return True
 
-    def write_json(self, body: Any, encryption=None) -> None:
-        self.write(json.dumps(body, default=str), encryption)
+    def _remote_etag(self) -> Optional[str]:
+        # served from already loaded object metadata, which boto3 resets after every action, one HEAD otherwise
+        try:
+            return self.object.e_tag
+        except ClientError as cerr:
+            if cerr.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                return None
+            raise cerr
 
-    def upload_file(self, fileobj: IO, encryption=None):
+    def write_async(self, body: Union[str, bytes], encryption=None, codec: Optional[str] = None,
+                    level: Optional[int] = None, tags: Optional[dict] = None, skip_unchanged: bool = False,
+                    writer=None) -> 'Future[S3Url]':
+        '''
+        Queues write on a background writer and returns immediately
+        :param writer: S3Writer to use, shared default writer if not set
+        :return: future resolved with this url once written
+        '''
+        from s3_url.s3_writer import S3Writer
+        return (writer or S3Writer.default()).write(self, body, encryption, codec, level, tags, skip_unchanged)
+
+    def _encode_body(self, body: Union[str, bytes], codec: Optional[str], level: Optional[int]) -> Union[str, bytes]:
+        codec = _resolve_codec(codec, self.key)
+        if not codec:
+            return body
+        compressor = _compressobj(codec, level)
+        return compressor.compress(body.encode() if isinstance(body, str) else body) + compressor.flush()
+
+    def _put_args(self, encryption=None, codec: Optional[str] = None, tags: Optional[dict] = None) -> dict:
+        put_args = {}
         if encryption:
-            self.object.upload_fileobj(fileobj, ExtraArgs={
-                'ServerSideEncryption': encryption
-            })
+            put_args['ServerSideEncryption'] = encryption
+        if tags:
+            put_args['Tagging'] = urlencode(tags)
+        codec = _resolve_codec(codec, self.key)
+        # compressed files with matching suffix (e.g. .gz) are stored as is, otherwise compression is transparent
+        if codec and _SUFFIX_CODECS.get(PurePosixPath(self.key).suffix.lower()) != codec:
+            put_args['ContentEncoding'] = codec
+        return put_args
+
+    def write_text(self, body: str, encryption=None, codec: Optional[str] = None, level: Optional[int] = None,
+                   tags: Optional[dict] = None, skip_unchanged: bool = False) -> bool:
+        return self.write(body, encryption, codec, level, tags, skip_unchanged)
+
+    def write_json(self, body: Any, encryption=None, codec: Optional[str] = None, level: Optional[int] = None,
+                   tags: Optional[dict] = None, skip_unchanged: bool = False) -> bool:
+        return self.write(json.dumps(body, default=str), encryption, codec, level, tags, skip_unchanged)
+
+    def upload_file(self, fileobj: IO, encryption=None, codec: Optional[str] = None, level: Optional[int] = None,
+                    skip_unchanged: bool = False) -> bool:
+        '''
+        Uploads file object, large files are uploaded in parts
+        :param fileobj: binary file object
+        :param encryption: server side encryption
+        :param codec: "gzip", "zstd" or "auto" to detect it from key suffix, no compression if not set
+        :param level: compression level, codec default if not set
+        :param skip_unchanged: don't upload if size and (multipart) md5 match remote ETag,
+            fileobj must be seekable unless codec is set
+        :return: True if object was uploaded, False if skipped
+        '''
+        codec = _resolve_codec(codec, self.key)
+        if codec:
+            fileobj = _CompressingReader(fileobj, codec, level)
+            if skip_unchanged:
+                # compressed body has to be hashed and then uploaded, so it is spooled to disk when large
+                spooled = tempfile.SpooledTemporaryFile(max_size=TransferConfig().multipart_threshold)
+                shutil.copyfileobj(fileobj, spooled)
+                spooled.seek(0)
+                fileobj = spooled
+        if skip_unchanged and self._is_stream_unchanged(fileobj):
+            return False
+        extra_args = self._put_args(encryption, codec)
+        if extra_args:
+            self.object.upload_fileobj(fileobj, ExtraArgs=extra_args)
         else:
             self.object.upload_fileobj(fileobj)
+        # upload_fileobj is not a resource action, so loaded metadata is reset here
+        self.object.meta.data = None
+        return True
+
+    def _is_stream_unchanged(self, fileobj: IO[bytes]) -> bool:
+        remote_etag = self._remote_etag()
+        if not remote_etag:
+            return False
+        start = fileobj.tell()
+        size = fileobj.seek(0, io.SEEK_END) - start
+        try:
+            if size != self.object.content_length:
+                return False
+            fileobj.seek(start)
+            return _etag_matches(fileobj, size, remote_etag, TransferConfig().multipart_chunksize)
+        finally:
+            fileobj.seek(start)
+
+    def upload_dir(self, local_path: Union[str, Path], include: Optional[Iterable[str]] = None,
+                   exclude: Optional[Iterable[str]] = None, encryption=None, skip_unchanged: bool = False,
+                   max_workers: int = 10, transfer_config: Optional[TransferConfig] = None) -> List['S3Url']:
+        '''
+        Uploads local directory tree under this prefix, files are uploaded concurrently
+        :param local_path: local directory to upload
+        :param include: glob patterns matched against file paths relative to local_path, all files if not set
+        :param exclude: glob patterns of relative file paths to skip
+        :param encryption: server side encryption to apply to every uploaded object
+        :param skip_unchanged: don't upload files which size and md5 match remote object ETag
+        :param max_workers: number of concurrent uploads
+        :param transfer_config: boto3 TransferConfig controlling multipart uploads of large files
+        :return: list of uploaded objects urls
+        '''
+        transfer_config = transfer_config or TransferConfig()
+        client = self._resource.meta.client
+        prefix = self._dir_prefix()
+        remote_objects = {}
+        if skip_unchanged:
+            remote_objects = {obj['Key']: obj for obj in self._list_object_summaries(prefix)}
+        extra_args = {'ServerSideEncryption': encryption} if encryption else None
+
+        def upload(path: Path, key: str) -> Optional['S3Url']:
+            if skip_unchanged and _is_unchanged(path, remote_objects.get(key), transfer_config):
+                return None
+            client.upload_file(str(path), self.bucket, key, ExtraArgs=extra_args, Config=transfer_config)
+            return S3Url.from_bucket_key(self.bucket, key)
+
+        uploaded = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = set()
+            for path, rel_path in _walk_files(local_path, include, exclude):
+                pending.add(executor.submit(upload, path, prefix + rel_path))
+                # keep directory walk lazy - don't queue more than a couple of files per worker
+                if len(pending) >= max_workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    uploaded.extend(future.result() for future in done)
+            uploaded.extend(future.result() for future in pending)
+        return [url for url in uploaded if url]
+
+    def download_dir(self, local_path: Union[str, Path], skip_unchanged: bool = True, max_workers: int = 10,
+                     max_in_flight_bytes: int = 512 * 1024 * 1024,
+                     transfer_config: Optional[TransferConfig] = None) -> List[Path]:
+        '''
+        Downloads all objects under this prefix to local directory concurrently.
+        Every object is streamed to a temp file which is renamed when complete, so interrupted runs can be resumed
+        :param local_path: local directory to download to
+        :param skip_unchanged: don't download objects which local copy matches size and ETag. Multipart ETags are
+            matched with transfer_config chunk size or whole MiB part sizes, objects uploaded with other part sizes
+            are downloaded again
+        :param max_workers: number of concurrent downloads
+        :param max_in_flight_bytes: limit of total size of objects being downloaded at the same time
+        :param transfer_config: boto3 TransferConfig controlling ranged parallel downloads of large objects
+        :return: list of downloaded files
+        '''
+        transfer_config = transfer_config or TransferConfig()
+        client = self._resource.meta.client
+        prefix = self._dir_prefix()
+        root = Path(local_path).resolve()
+        budget = _ByteBudget(max_in_flight_bytes)
+
+        def download(obj: dict, path: Path, reserved: int) -> Optional[Path]:
+            try:
+                if skip_unchanged and path.exists() and _is_unchanged(path, obj, transfer_config):
+                    return None
+                path.parent.mkdir(parents=True, exist_ok=True)
+                fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+                try:
+                    with os.fdopen(fd, 'wb') as fobj:
+                        client.download_fileobj(self.bucket, obj['Key'], fobj, Config=transfer_config)
+                    os.replace(tmp_name, path)
+                except BaseException:
+                    os.remove(tmp_name)
+                    raise
+                return path
+            finally:
+                budget.release(reserved)
+
+        downloaded = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = set()
+            for obj in self._list_object_summaries(prefix):
+                if obj['Key'].endswith('/'):
+                    continue
+                path = (root / obj['Key'][len(prefix):]).resolve()
+                if root not in path.parents:
+                    raise ValueError(f'Key {obj["Key"]} points outside of {root}')
+                reserved = budget.acquire(obj['Size'])
+                pending.add(executor.submit(download, obj, path, reserved))
+                if len(pending) >= max_workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    downloaded.extend(future.result() for future in done)
+            downloaded.extend(future.result() for future in pending)
+        return [path for path in downloaded if path]
+
+    def _dir_prefix(self) -> str:
+        return self.key if not self.key or self.key.endswith('/') else self.key + '/'
+
+    def _list_object_summaries(self, prefix: Optional[str] = None, start_after: Optional[str] = None) -> Iterable[dict]:
+        list_args = {'StartAfter': start_after} if start_after else {}
+        for s3_obj in self._resource.meta.client \
+                .get_paginator('list_objects_v2') \
+                .paginate(Bucket=self.bucket, Prefix=self.key if prefix is None else prefix, **list_args) \
+                .search('Contents'):
+            if s3_obj:
+                yield s3_obj
+
+    def delete_dir(self, inventory: Optional['S3Inventory'] = None) -> None:
+        '''
+        Deletes all objects under this prefix, in batches of 1000 keys
+        :param inventory: S3Inventory to take keys from instead of live listing
+        '''
+        client = self._resource.meta.client
+        batch = []
+        for url in self.list_prefix_objects(inventory):
+            batch.append({'Key': url.key})
+            if len(batch) == 1000:
+                self._delete_objects(client, batch)
+                batch = []
+        if batch:
+            self._delete_objects(client, batch)
+
+    def _delete_objects(self, client, batch: List[dict]) -> None:
+        response = client.delete_objects(Bucket=self.bucket, Delete={'Objects': batch, 'Quiet': True})
+        if response.get('Errors'):
+            raise ClientError({'Error': response['Errors'][0]}, 'DeleteObjects')
+
+    def copy_dir_to(self, target_url: Union[str, 'S3Url'], inventory: Optional['S3Inventory'] = None) -> None:
+        '''
+        Copies all objects under this prefix to target prefix, keeping key parts after the prefix
+        :param target_url: target prefix url
+        :param inventory: S3Inventory to take keys from instead of live listing
+        '''
+        target_obj = S3Url(target_url)
+        for url in self.list_prefix_objects(inventory):
+            url.copy_to(S3Url.from_bucket_key(target_obj.bucket, target_obj.key + url.key[len(self.key):]))
 
-    def delete_dir(self):
-        for obj in self._local.s3_res.Bucket(self.bucket).objects.filter(Prefix=self.key):
-            obj.delete()
+    def transition_dir_to_storage_tier(self, storage_tier: str, inventory: Optional['S3Inventory'] = None) -> None:
+        '''
+        Transitions all objects under this prefix to storage tier, objects already in it are skipped
+        :param storage_tier: target storage class
+        :param inventory: S3Inventory to take keys from instead of live listing
+        '''
+        for url in self.list_prefix_objects(inventory):
+            if url.storage_class != storage_tier:
+                url.transition_to_storage_tier(storage_tier)
 
     def write_tags(self, tags: dict) -> None:
         if tags:
             tag_set = [{'Key': k, 'Value': v} for k, v in tags.items()]
-            self._local.s3_res.meta.client.put_object_tagging(
+            self._resource.meta.client.put_object_tagging(
                 Bucket=self.bucket,
                 Key=self.key,
                 Tagging={
@@ -132,7 +875,7 @@ class S3Url():
             )
 
     def read_tags(self) -> dict:
-        tags = self._local.s3_res.meta.client.get_object_tagging(
+        tags = self._resource.meta.client.get_object_tagging(
             Bucket=self.bucket,
             Key=self.key,
         )
@@ -141,7 +884,7 @@ class S3Url():
         return {}
 
     def transition_to_storage_tier(self, storage_tier: str):
-        return self._local.s3_res.meta.client.copy_object(
+        return self._resource.meta.client.copy_object(
             CopySource={
                 'Bucket': self.bucket,
                 'Key': self.key
@@ -152,7 +895,7 @@ class S3Url():
             MetadataDirective='COPY')
 
     def restore_to_storage_tier(self, days: int, retrieval_tier: str = "Standard"):
-        return self._local.s3_res.meta.client.restore_object(
+        return self._resource.meta.client.restore_object(
             Bucket=self.bucket,
             Key=self.key,
             RestoreRequest={'Days': days, 'GlacierJobParameters': {'Tier': retrieval_tier}})
@@ -162,20 +905,20 @@ class S3Url():
             target_obj = target_url
         else:
             target_obj = S3Url(target_url)
-        self._local.s3_res.meta.client.copy({
+        target_obj._resource.meta.client.copy({
             'Bucket': self.bucket,
             'Key': self.key
-        }, target_obj.bucket, target_obj.key)
+        }, target_obj.bucket, target_obj.key, SourceClient=self._resource.meta.client)
 
     def copy_from(self, source_url: Union[str, 'S3Url']) -> None:
         if isinstance(source_url, S3Url):
             source_obj = source_url
         else:
             source_obj = S3Url(source_url)
-        self._local.s3_res.meta.client.copy({
+        self._resource.meta.client.copy({
             'Bucket': source_obj.bucket,
             'Key': source_obj.key
-        }, self.bucket, self.key)
+        }, self.bucket, self.key, SourceClient=source_obj._resource.meta.client)
 
     def copy_tags_to(self, target_url: Union[str, 'S3Url']) -> None:
         source_tags = self.read_tags()
@@ -192,38 +935,81 @@ class S3Url():
             source_obj = S3Url(source_url)
         source_obj.copy_tags_to(self)
 
-    def list_prefix_objects(self) -> Iterable['S3Url']:
-        for s3_obj in self._object.Bucket().objects.filter(Prefix=self.key):
-            yield S3Url(f's3://{s3_obj.bucket_name}/{s3_obj.key}')
+    def list_prefix_objects(self, inventory: Optional['S3Inventory'] = None) -> Iterable['S3Url']:
+        '''
+        Lists objects under this prefix, listing metadata is available via size, etag, storage_class, last_modified
+        :param inventory: S3Inventory snapshot to read instead of live listing, for very large prefixes
+        :return: iterable of object urls
+        '''
+        if inventory is not None:
+            if inventory.source_bucket != self.bucket:
+                raise ValueError(f'Inventory of bucket {inventory.source_bucket} can not list {self.bucket}')
+            yield from inventory.list_objects(self.key)
+            return
+        for s3_obj in self.object.Bucket().objects.filter(Prefix=self.key):
+            yield S3Url._from_summary(s3_obj.bucket_name, s3_obj.meta.data)
 
     def list_common_prefixes(self) -> Iterable['S3Url']:
-        for prefix in self._local.s3_res.meta.client \
+        for prefix in self._resource.meta.client \
                 .get_paginator('list_objects') \
                 .paginate(Bucket=self.bucket, Prefix=self.key, Delimiter='/').search('CommonPrefixes'):
             if prefix:
                 yield S3Url(f's3://{self.bucket}/{prefix["Prefix"]}')
 
+    def usage(self, depth: int = 1, max_workers: int = 10) -> Iterable[PrefixUsage]:
+        '''
+        Aggregates object count, size, storage classes and oldest/newest modification time per sub-prefix
+        from listing metadata only. Sub-prefixes are listed concurrently and results are yielded as they complete.
+        Rows don't overlap: every sub-prefix at the given depth gets a row with totals of everything under it,
+        objects placed directly in shallower prefixes are counted in rows of those prefixes
+        :param depth: number of "/"-delimited levels below this prefix, 0 gives a single total row
+        :param max_workers: number of concurrent listings
+        :return: iterable of PrefixUsage, use usage_report to format them
+        '''
+        client = self._resource.meta.client
+
+        def scan(prefix: str, level: int) -> Tuple[PrefixUsage, List[str], int]:
+            prefix_usage = PrefixUsage(S3Url.from_bucket_key(self.bucket, prefix).url)
+            list_args = {'Delimiter': '/'} if level < depth else {}
+            sub_prefixes = []
+            for page in client.get_paginator('list_objects_v2').paginate(Bucket=self.bucket, Prefix=prefix,
+                                                                         **list_args):
+                for summary in page.get('Contents', []):
+                    prefix_usage.add(summary)
+                sub_prefixes.extend(common_prefix['Prefix'] for common_prefix in page.get('CommonPrefixes', []))
+            return prefix_usage, sub_prefixes, level
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = {executor.submit(scan, self._dir_prefix(), 0)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    prefix_usage, sub_prefixes, level = future.result()
+                    pending.update(executor.submit(scan, sub_prefix, level + 1) for sub_prefix in sub_prefixes)
+                    if prefix_usage.objects:
+                        yield prefix_usage
+
     def generate_presigned_url_get(self, timeout=3600) -> str:
-        return self._enforce_regional_endpoint(self._local.s3_res.meta.client.generate_presigned_url(
+        return self._enforce_regional_endpoint(self._resource.meta.client.generate_presigned_url(
             ClientMethod='get_object',
             Params={'Bucket': self.bucket, 'Key': self.key},
             ExpiresIn=timeout
         ))
 
     def generate_presigned_url_put(self, timeout=3600, **params) -> str:
-        return self._enforce_regional_endpoint(self._local.s3_res.meta.client.generate_presigned_url(
+        return self._enforce_regional_endpoint(self._resource.meta.client.generate_presigned_url(
             ClientMethod='put_object',
             Params={'Bucket': self.bucket, 'Key': self.key, **params},
             ExpiresIn=timeout
         ))
 
     def _enforce_regional_endpoint(self, url: str) -> str:
-        if self._local.s3_res.meta.client.meta.region_name:
+        if self._resource.meta.client.meta.region_name:
             # a little fix to make url regional to avoid issues with VPC endpoint routing that occur sometimes
             # see https://repost.aws/knowledge-center/s3-http-307-response
             return url.replace(
                 ".s3.amazonaws.com",
-                f".s3.{self._local.s3_res.meta.client.meta.region_name}.amazonaws.com")
+                f".s3.{self._resource.meta.client.meta.region_name}.amazonaws.com")
         else:
             return url
 
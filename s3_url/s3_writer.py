@@ -0,0 +1,110 @@
+import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Union, Optional, Any, Set
+
+from s3_url.s3_url import S3Url
+
+
+class S3Writer():
+    '''
+    Write-behind writer: queues writes on a bounded background pool and returns futures.
+    Callers block only when max_queue_size writes are already pending.
+    '''
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, max_workers: int = 10, max_queue_size: int = 1000):
+        '''
+        Creates writer instance
+        :param max_workers: number of concurrent writes
+        :param max_queue_size: max number of queued and running writes before callers are blocked
+        '''
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='S3Writer')
+        self._slots = threading.BoundedSemaphore(max_queue_size)
+        self._pending: Set[Future] = set()
+        self._pending_lock = threading.Lock()
+        self._error: Optional[BaseException] = None
+
+    @classmethod
+    def default(cls) -> 'S3Writer':
+        '''
+        Returns shared writer used by S3Url.write_async
+        '''
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = S3Writer()
+            return cls._default
+
+    def __enter__(self) -> 'S3Writer':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def write(self, url: Union[str, S3Url], body: Union[str, bytes], encryption=None, codec: Optional[str] = None,
+              level: Optional[int] = None, tags: Optional[dict] = None,
+              skip_unchanged: bool = False) -> 'Future[S3Url]':
+        url = S3Url(url)
+        return self._submit(url, url.write, body, encryption, codec, level, tags, skip_unchanged)
+
+    def write_text(self, url: Union[str, S3Url], body: str, encryption=None, codec: Optional[str] = None,
+                   level: Optional[int] = None, tags: Optional[dict] = None,
+                   skip_unchanged: bool = False) -> 'Future[S3Url]':
+        return self.write(url, body, encryption, codec, level, tags, skip_unchanged)
+
+    def write_json(self, url: Union[str, S3Url], body: Any, encryption=None, codec: Optional[str] = None,
+                   level: Optional[int] = None, tags: Optional[dict] = None,
+                   skip_unchanged: bool = False) -> 'Future[S3Url]':
+        # serialized right away, so later changes of body by the caller are not written
+        return self.write(url, json.dumps(body, default=str), encryption, codec, level, tags, skip_unchanged)
+
+    def write_tags(self, url: Union[str, S3Url], tags: dict) -> 'Future[S3Url]':
+        url = S3Url(url)
+        return self._submit(url, url.write_tags, tags)
+
+    def flush(self) -> None:
+        '''
+        Waits for all writes queued so far, raises the first write error since previous flush if any
+        '''
+        with self._pending_lock:
+            pending = list(self._pending)
+        wait(pending)
+        with self._pending_lock:
+            error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def close(self) -> None:
+        '''
+        Flushes pending writes and stops background threads
+        '''
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def _submit(self, url: S3Url, method, *args) -> 'Future[S3Url]':
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._run, url, method, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._pending_lock:
+            self._pending.add(future)
+        future.add_done_callback(self._on_done)
+        return future
+
+    @staticmethod
+    def _run(url: S3Url, method, *args) -> S3Url:
+        method(*args)
+        return url
+
+    def _on_done(self, future: Future) -> None:
+        with self._pending_lock:
+            self._pending.discard(future)
+            # kept until next flush, so errors of writes completed before flush are not lost
+            if self._error is None and not future.cancelled() and future.exception() is not None:
+                self._error = future.exception()
+        self._slots.release()
@@ -0,0 +1,53 @@
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Optional, Iterable
+
+
+@dataclass
+class PrefixUsage():
+    '''
+    Object count and byte totals of a prefix, aggregated from listing metadata
+    '''
+    prefix: str
+    objects: int = 0
+    size: int = 0
+    storage_classes: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    oldest: Optional[datetime] = None
+    newest: Optional[datetime] = None
+
+    def add(self, summary: dict) -> None:
+        '''
+        Adds listing entry (dict with Size, StorageClass, LastModified) to the totals
+        '''
+        self.objects += 1
+        self.size += summary['Size']
+        storage_class = self.storage_classes.setdefault(summary.get('StorageClass') or 'STANDARD',
+                                                        {'objects': 0, 'size': 0})
+        storage_class['objects'] += 1
+        storage_class['size'] += summary['Size']
+        last_modified = summary['LastModified']
+        if self.oldest is None or last_modified < self.oldest:
+            self.oldest = last_modified
+        if self.newest is None or last_modified > self.newest:
+            self.newest = last_modified
+
+    def to_dict(self) -> dict:
+        return {
+            'prefix': self.prefix,
+            'objects': self.objects,
+            'size': self.size,
+            'storage_classes': self.storage_classes,
+            'oldest': self.oldest.isoformat() if self.oldest else None,
+            'newest': self.newest.isoformat() if self.newest else None,
+        }
+
+
+def usage_report(usages: Iterable[PrefixUsage]) -> str:
+    '''
+    Formats usage as JSON Lines sorted by prefix, so reports of different runs can be diffed
+    :param usages: result of S3Url.usage
+    :return: report text
+    '''
+    rows = sorted((usage.to_dict() for usage in usages), key=lambda row: row['prefix'])
+    return ''.join(json.dumps(row, sort_keys=True) + '\n' for row in rows)
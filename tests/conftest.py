@@ -33,6 +33,8 @@ def aws_defaults():
 def s3_moto():
     with mock_aws():
         S3Url._s3_res = boto3.resource('s3')
+        S3Url._bucket_regions.clear()
+        S3Url._unresolved_buckets.clear()
         yield
 
 
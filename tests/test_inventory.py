@@ -0,0 +1,102 @@
+import csv
+import gzip
+import io
+from datetime import datetime, timezone
+
+import boto3
+import pytest
+from assertpy import assert_that
+
+from s3_url import S3Url, S3Inventory
+from tests.conftest import TEST_BUCKET
+
+INVENTORY_BUCKET = 'inventory-bucket'
+INVENTORY_PREFIX = f'inventory/{TEST_BUCKET}/daily'
+
+
+def write_inventory(date: str, rows_per_file: list) -> str:
+    manifest_key = f'{INVENTORY_PREFIX}/{date}/manifest.json'
+    files = []
+    for i, rows in enumerate(rows_per_file):
+        data = io.StringIO()
+        csv.writer(data, quoting=csv.QUOTE_ALL).writerows(rows)
+        key = f'{INVENTORY_PREFIX}/data/{date}-{i}.csv.gz'
+        S3Url.from_bucket_key(INVENTORY_BUCKET, key).write(gzip.compress(data.getvalue().encode()))
+        files.append({'key': key, 'size': 0, 'MD5checksum': ''})
+    S3Url.from_bucket_key(INVENTORY_BUCKET, manifest_key).write_json({
+        'sourceBucket': TEST_BUCKET,
+        'destinationBucket': f'arn:aws:s3:::{INVENTORY_BUCKET}',
+        'version': '2016-11-30',
+        'fileFormat': 'CSV',
+        'fileSchema': 'Bucket, Key, VersionId, IsLatest, IsDeleteMarker, Size, LastModifiedDate, ETag, StorageClass',
+        'files': files,
+    })
+    return f's3://{INVENTORY_BUCKET}/{manifest_key}'
+
+
+def row(key: str, size: int = 1, storage_class: str = 'STANDARD', is_latest: str = 'true', deleted: str = 'false'):
+    return [TEST_BUCKET, key, '', is_latest, deleted, str(size), '2024-05-16T10:20:30.000Z',
+            '0cc175b9c0f1b6a831c399e269772661', storage_class]
+
+
+@pytest.fixture
+def s3_inventory(s3_test_bucket):
+    boto3.resource('s3').create_bucket(Bucket=INVENTORY_BUCKET)
+    for key in ['data/a.txt', 'data/sub/b c.txt', 'logs/c.txt']:
+        S3Url.from_bucket_key(TEST_BUCKET, key).write_text('a')
+    write_inventory('2024-05-15T01-00Z', [[row('data/old.txt')]])
+    manifest_url = write_inventory('2024-05-16T01-00Z', [
+        [row('data/a.txt'), row('data/sub/b+c.txt', 3, 'GLACIER')],
+        [row('logs/c.txt'), row('data/deleted.txt', deleted='true'), row('data/a.txt', is_latest='false')],
+    ])
+    yield S3Inventory(manifest_url)
+
+
+def test_inventory_list_objects(s3_inventory):
+    objects = list(s3_inventory.list_objects('data/'))
+
+    assert_that(objects).is_equal_to([S3Url(f's3://{TEST_BUCKET}/data/a.txt'),
+                                      S3Url(f's3://{TEST_BUCKET}/data/sub/b c.txt')])
+    assert_that(objects[1].size).is_equal_to(3)
+    assert_that(objects[1].storage_class).is_equal_to('GLACIER')
+    assert_that(objects[1].etag).is_equal_to('"0cc175b9c0f1b6a831c399e269772661"')
+    assert_that(objects[1].last_modified).is_equal_to(datetime(2024, 5, 16, 10, 20, 30, tzinfo=timezone.utc))
+    assert_that(list(s3_inventory.list_objects())).is_length(3)
+
+
+def test_inventory_latest(s3_inventory, monkeypatch):
+    # report being delivered - data file without manifest yet
+    S3Url(f's3://{INVENTORY_BUCKET}/{INVENTORY_PREFIX}/2024-05-17T01-00Z/manifest.checksum').write_text('1')
+    list_prefix_objects = S3Url.list_prefix_objects
+
+    def no_full_listing(self, *args, **kwargs):
+        assert_that(self.key).does_not_start_with(INVENTORY_PREFIX)
+        return list_prefix_objects(self, *args, **kwargs)
+
+    monkeypatch.setattr(S3Url, 'list_prefix_objects', no_full_listing)
+    inventory = S3Inventory.latest(f's3://{INVENTORY_BUCKET}/{INVENTORY_PREFIX}')
+    assert_that(inventory.manifest).is_equal_to(s3_inventory.manifest)
+    assert_that(inventory.source_bucket).is_equal_to(TEST_BUCKET)
+
+
+def test_list_prefix_objects_from_inventory(s3_inventory):
+    prefix = S3Url(f's3://{TEST_BUCKET}/data/')
+    assert_that(list(prefix.list_prefix_objects(inventory=s3_inventory))).is_length(2)
+    with pytest.raises(ValueError):
+        list(S3Url(f's3://{INVENTORY_BUCKET}/data/').list_prefix_objects(s3_inventory))
+
+
+def test_dir_operations_from_inventory(s3_inventory):
+    prefix = S3Url(f's3://{TEST_BUCKET}/data/')
+
+    prefix.copy_dir_to(f's3://{TEST_BUCKET}/copy/', inventory=s3_inventory)
+    assert_that(f's3://{TEST_BUCKET}/copy/sub/b c.txt').s3_file_exists()
+
+    prefix.transition_dir_to_storage_tier('GLACIER', inventory=s3_inventory)
+    assert_that(S3Url(f's3://{TEST_BUCKET}/data/a.txt').storage_class).is_equal_to('GLACIER')
+    # skipped - listed as GLACIER in the inventory already
+    assert_that(S3Url(f's3://{TEST_BUCKET}/data/sub/b c.txt').storage_class).is_equal_to('STANDARD')
+
+    prefix.delete_dir(inventory=s3_inventory)
+    assert_that(prefix.prefix_exists()).is_false()
+    assert_that(f's3://{TEST_BUCKET}/logs/c.txt').s3_file_exists()
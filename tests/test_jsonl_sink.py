@@ -0,0 +1,109 @@
+import json
+import threading
+from datetime import datetime, timezone
+
+import pytest
+from assertpy import assert_that
+
+from s3_url import S3Url, JsonLinesSink
+
+TIMESTAMP = datetime(2024, 5, 17, 13, 45, tzinfo=timezone.utc)
+
+
+def read_lines(url: str) -> list:
+    return [json.loads(line) for line in S3Url(url).read_text(codec='auto').splitlines()]
+
+
+def test_sink_rolls_over_by_record_count(s3_test_bucket):
+    with JsonLinesSink(f's3://{s3_test_bucket.name}/events', max_records=10) as sink:
+        for i in range(25):
+            sink.write({'id': i}, timestamp=TIMESTAMP)
+    manifest = sink.manifest
+
+    assert_that(manifest).is_length(3)
+    assert_that([entry['records'] for entry in manifest]).is_equal_to([10, 10, 5])
+    assert_that(manifest[0]['url']).starts_with(f's3://{s3_test_bucket.name}/events/2024-05-17/13/part-') \
+        .ends_with('-00001.jsonl')
+    assert_that([record for entry in manifest for record in read_lines(entry['url'])]) \
+        .is_equal_to([{'id': i} for i in range(25)])
+
+
+def test_sink_partition_template(s3_test_bucket):
+    sink = JsonLinesSink(S3Url(f's3://{s3_test_bucket.name}/events/'),
+                         partition_template='type={record[type]}/{dt:%Y/%m/%d}', codec='gzip')
+    sink.write({'type': 'click', 'id': 1}, timestamp=TIMESTAMP)
+    sink.write({'type': 'view', 'id': 2}, timestamp=TIMESTAMP)
+    sink.write({'type': 'click', 'id': 3}, timestamp=TIMESTAMP)
+    manifest = sorted(sink.close(), key=lambda entry: entry['partition'])
+
+    assert_that([entry['partition'] for entry in manifest]).is_equal_to(['type=click/2024/05/17',
+                                                                          'type=view/2024/05/17'])
+    assert_that(manifest[0]['url']).ends_with('.jsonl.gz')
+    assert_that(read_lines(manifest[0]['url'])).is_equal_to([{'type': 'click', 'id': 1}, {'type': 'click', 'id': 3}])
+
+
+def test_sink_streams_multipart_upload(s3_test_bucket):
+    payload = 'x' * 1024
+    sink = JsonLinesSink(f's3://{s3_test_bucket.name}/events/', part_size=5 * 1024 * 1024,
+                         max_part_bytes=8 * 1024 * 1024, encryption='AES256')
+    for i in range(11 * 1024):
+        sink.write({'id': i, 'payload': payload}, timestamp=TIMESTAMP)
+    manifest = sink.close()
+
+    assert_that([entry['records'] for entry in manifest]).is_length(2)
+    assert_that(sum(entry['records'] for entry in manifest)).is_equal_to(11 * 1024)
+    first = S3Url(manifest[0]['url'])
+    assert_that(first.object.e_tag).ends_with('-2"')
+    assert_that(first.object.server_side_encryption).is_equal_to('AES256')
+    assert_that(read_lines(manifest[0]['url'])[-1]['id']).is_equal_to(manifest[0]['records'] - 1)
+
+
+def test_sink_rolls_over_by_age(s3_test_bucket, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('s3_url.jsonl_sink.time.monotonic', lambda: now[0])
+    sink = JsonLinesSink(f's3://{s3_test_bucket.name}/events/', max_age_seconds=60)
+    sink.write({'id': 1}, timestamp=TIMESTAMP)
+    sink.roll_expired()
+    assert_that(sink.manifest).is_empty()
+
+    now[0] += 60
+    sink.roll_expired()
+    assert_that(sink.manifest).is_length(1)
+    sink.write({'id': 2}, timestamp=TIMESTAMP)
+    assert_that(sink.close()).is_length(2)
+
+
+def test_sink_concurrent_writers(s3_test_bucket):
+    sinks = [JsonLinesSink(f's3://{s3_test_bucket.name}/events/', max_records=30) for _ in range(2)]
+
+    def write_records(sink, start):
+        for i in range(start, start + 100):
+            sink.write({'id': i}, timestamp=TIMESTAMP)
+
+    threads = [threading.Thread(target=write_records, args=(sinks[n % 2], n * 100)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    manifest = sinks[0].close() + sinks[1].close()
+
+    assert_that(sum(entry['records'] for entry in manifest)).is_equal_to(400)
+    assert_that(sorted(record['id'] for entry in manifest for record in read_lines(entry['url']))) \
+        .is_equal_to(list(range(400)))
+
+
+def test_sink_invalid_arguments_fail_on_init(s3_test_bucket):
+    with pytest.raises(ValueError):
+        JsonLinesSink(f's3://{s3_test_bucket.name}/events', part_size=1024)
+    with pytest.raises(ValueError):
+        JsonLinesSink(f's3://{s3_test_bucket.name}/events', codec='auto')
+
+
+def test_sink_refuses_writes_after_close(s3_test_bucket):
+    sink = JsonLinesSink(f's3://{s3_test_bucket.name}/events')
+    sink.write({'id': 1}, timestamp=TIMESTAMP)
+    sink.close()
+
+    with pytest.raises(RuntimeError):
+        sink.write({'id': 2}, timestamp=TIMESTAMP)
+    assert_that(sink.close()).is_length(1)
@@ -0,0 +1,91 @@
+import pytest
+from assertpy import assert_that
+
+from s3_url import S3Url, PrefixIndex
+
+KEYS = [
+    'data/2024-05-16/a.json',
+    'data/2024-05-16/b.json',
+    'data/2024-05-17/a.json',
+    'data/2024-05-17/sub/c.json',
+    'data/readme.txt',
+    'data/ünïcode.txt',
+]
+
+
+@pytest.fixture
+def indexed_bucket(s3_test_bucket):
+    for key in KEYS + ['other/x.txt']:
+        s3_test_bucket.put_object(Key=key, Body=b'1')
+    yield s3_test_bucket
+
+
+def urls(bucket, *keys):
+    return [S3Url.from_bucket_key(bucket.name, key) for key in keys]
+
+
+def test_prefix_index_queries(indexed_bucket):
+    index = PrefixIndex.build(f's3://{indexed_bucket.name}/data/')
+
+    assert_that(index).is_length(len(KEYS))
+    assert_that(index.exists('data/2024-05-17/a.json')).is_true()
+    assert_that(S3Url(f's3://{indexed_bucket.name}/data/ünïcode.txt') in index).is_true()
+    assert_that('data/2024-05-17' in index).is_false()
+    assert_that('other/x.txt' in index).is_false()
+    assert_that(list(index.keys())).is_equal_to(KEYS)
+    assert_that(list(index.list_prefix_objects('data/2024-05-17/'))) \
+        .is_equal_to(urls(indexed_bucket, 'data/2024-05-17/a.json', 'data/2024-05-17/sub/c.json'))
+    assert_that(list(index.range('data/2024-05-16/b.json', 'data/2024-05-17/sub/'))) \
+        .is_equal_to(['data/2024-05-16/b.json', 'data/2024-05-17/a.json'])
+    assert_that(list(index.glob('data/2024-*/a.json'))) \
+        .is_equal_to(urls(indexed_bucket, 'data/2024-05-16/a.json', 'data/2024-05-17/a.json'))
+    assert_that(list(index.glob('data/*.txt'))) \
+        .is_equal_to(urls(indexed_bucket, 'data/readme.txt', 'data/ünïcode.txt'))
+
+
+def test_prefix_index_children(indexed_bucket):
+    index = PrefixIndex.build(f's3://{indexed_bucket.name}/data/')
+
+    assert_that(list(index.children())).is_equal_to(urls(
+        indexed_bucket, 'data/2024-05-16/', 'data/2024-05-17/', 'data/readme.txt', 'data/ünïcode.txt'))
+    assert_that(list(index.list_common_prefixes('data/2024-05-17/'))) \
+        .is_equal_to(urls(indexed_bucket, 'data/2024-05-17/sub/'))
+    assert_that(list(index.list_common_prefixes())) \
+        .is_equal_to(list(S3Url(f's3://{indexed_bucket.name}/data/').list_common_prefixes()))
+
+
+def test_prefix_index_refresh(indexed_bucket):
+    index = PrefixIndex.build(f's3://{indexed_bucket.name}/data/')
+    indexed_bucket.put_object(Key='data/ünïcode.txt.bak', Body=b'1')
+    indexed_bucket.put_object(Key='data/2024-05-16/c.json', Body=b'1')
+    indexed_bucket.Object('data/2024-05-16/a.json').delete()
+
+    # watermark refresh sees keys after the last indexed one only
+    assert_that(index.refresh()).is_equal_to(1)
+    assert_that(index.exists('data/ünïcode.txt.bak')).is_true()
+    assert_that(index.exists('data/2024-05-16/c.json')).is_false()
+
+    assert_that(index.refresh_prefix('data/2024-05-16/')).is_equal_to(2)
+    assert_that(list(index.keys())).is_equal_to([
+        'data/2024-05-16/b.json',
+        'data/2024-05-16/c.json',
+        'data/2024-05-17/a.json',
+        'data/2024-05-17/sub/c.json',
+        'data/readme.txt',
+        'data/ünïcode.txt',
+        'data/ünïcode.txt.bak',
+    ])
+    assert_that(index.refresh_prefix).raises(ValueError).when_called_with('other/')
+
+
+def test_prefix_index_from_keys(s3_test_bucket):
+    index = PrefixIndex.from_keys(f's3://{s3_test_bucket.name}/data/', KEYS[3:] + KEYS[:3])
+    assert_that(list(index.keys())).is_equal_to(KEYS)
+    assert_that(index.nbytes).is_less_than(sum(len(key.encode()) + 16 for key in KEYS))
+
+
+def test_prefix_index_from_keys_skips_duplicates(s3_test_bucket):
+    prefix = f's3://{s3_test_bucket.name}/p/'
+    assert_that(list(PrefixIndex.from_keys(prefix, ['p/a', 'p/a', 'p/b']).keys())).is_equal_to(['p/a', 'p/b'])
+    assert_that(list(PrefixIndex.from_keys(prefix, ['p/b', 'p/a', 'p/a', 'p/b']).keys())) \
+        .is_equal_to(['p/a', 'p/b'])
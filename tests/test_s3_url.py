@@ -1,3 +1,4 @@
+import io
 import json
 import os
 from pathlib import Path
@@ -8,6 +9,7 @@ import pytest
 import requests
 from assertpy import assert_that
 from boto3 import s3
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError
 from s3_url import S3Url
 from tests.conftest import TEST_BUCKET, assert_with_timeout
@@ -579,4 +581,375 @@ def test_use_as_dict_key(s3_test_bucket):
 
     assert_that(test_dict[key1]).is_equal_to('value1')
     assert_that(test_dict[key2]).is_equal_to('value2')
-    assert_that(test_dict[key3]).is_equal_to('value3')
\ No newline at end of file
+    assert_that(test_dict[key3]).is_equal_to('value3')
+
+
+@pytest.fixture
+def s3_eu_bucket(s3_moto):
+    bucket = boto3.resource('s3', region_name='eu-west-1').create_bucket(
+        Bucket='test-bucket-eu',
+        CreateBucketConfiguration={'LocationConstraint': 'eu-west-1'})
+    yield bucket
+
+
+def test_bucket_region_routing(s3_test_bucket, s3_eu_bucket):
+    eu_url = S3Url(f's3://{s3_eu_bucket.name}/some_file.txt')
+    us_url = S3Url(f's3://{s3_test_bucket.name}/some_file.txt')
+
+    assert_that(S3Url.get_bucket_region(s3_eu_bucket.name)).is_equal_to('eu-west-1')
+    assert_that(eu_url.object.meta.client.meta.region_name).is_equal_to('eu-west-1')
+    assert_that(us_url.object.meta.client.meta.region_name).is_equal_to('us-east-1')
+
+    eu_url.write_text("eu data")
+    assert_that(eu_url.read_text()).is_equal_to("eu data")
+    assert_that(eu_url.generate_presigned_url_get()).contains('eu-west-1')
+
+    # cross-region copy
+    eu_url.copy_to(us_url)
+    assert_that(us_url.read_text()).is_equal_to("eu data")
+
+
+def test_bucket_region_lookup_failure_is_cached(s3_test_bucket, monkeypatch):
+    client = S3Url._default_resource().meta.client
+    head_bucket_calls = []
+    original_head_bucket = client.head_bucket
+
+    def head_bucket(**kwargs):
+        head_bucket_calls.append(kwargs)
+        return original_head_bucket(**kwargs)
+
+    monkeypatch.setattr(client, 'head_bucket', head_bucket)
+    url = S3Url('s3://missing-region-bucket/some_file.txt')
+    url.generate_presigned_url_get()
+    S3Url('s3://missing-region-bucket/other_file.txt').object
+
+    assert_that(head_bucket_calls).is_length(1)
+    assert_that(S3Url.get_bucket_region('missing-region-bucket')).is_none()
+    assert_that(url.object.meta.client).is_same_as(client)
+
+
+def test_bucket_region_transient_lookup_failure_is_retried(s3_eu_bucket, monkeypatch):
+    client = S3Url._default_resource().meta.client
+    original_head_bucket = client.head_bucket
+    failures = [ClientError({'Error': {'Code': 'SlowDown', 'Message': 'Slow down'},
+                             'ResponseMetadata': {'HTTPStatusCode': 503}}, 'HeadBucket')]
+
+    def head_bucket(**kwargs):
+        if failures:
+            raise failures.pop()
+        return original_head_bucket(**kwargs)
+
+    monkeypatch.setattr(client, 'head_bucket', head_bucket)
+
+    assert_that(S3Url.get_bucket_region(s3_eu_bucket.name)).is_none()
+    assert_that(S3Url.get_bucket_region(s3_eu_bucket.name)).is_equal_to('eu-west-1')
+
+
+def test_bucket_region_cache_persistence(s3_eu_bucket, tmp_path):
+    cache_file = tmp_path / 'regions.json'
+    S3Url.get_bucket_region(s3_eu_bucket.name)
+    S3Url.save_bucket_regions(cache_file)
+    assert_that(json.loads(cache_file.read_text())).contains_entry({s3_eu_bucket.name: 'eu-west-1'})
+
+    S3Url.load_bucket_regions(tmp_path / 'missing.json')
+    S3Url.set_bucket_region('some-other-bucket', 'ap-south-1')
+    cache_file.write_text(json.dumps({'some-other-bucket': 'eu-central-1'}))
+    S3Url.load_bucket_regions(cache_file)
+    assert_that(S3Url.get_bucket_region('some-other-bucket')).is_equal_to('eu-central-1')
+
+
+@pytest.fixture
+def local_dir(tmp_path):
+    root = tmp_path / 'build'
+    (root / 'sub' / 'deep').mkdir(parents=True)
+    (root / 'index.html').write_text('<html/>')
+    (root / 'app.js').write_text('console.log(1)')
+    (root / 'sub' / 'style.css').write_text('body {}')
+    (root / 'sub' / 'deep' / 'data.json').write_text('{"a": 1}')
+    (root / 'sub' / 'deep' / 'debug.log').write_text('log')
+    yield root
+
+
+def test_upload_dir(s3_test_bucket, local_dir):
+    prefix = S3Url(f's3://{s3_test_bucket.name}/site')
+    uploaded = prefix.upload_dir(local_dir, exclude=['*.log'], encryption='AES256', max_workers=2)
+
+    assert_that(uploaded).is_length(4).contains_only(
+        S3Url(f's3://{s3_test_bucket.name}/site/index.html'),
+        S3Url(f's3://{s3_test_bucket.name}/site/app.js'),
+        S3Url(f's3://{s3_test_bucket.name}/site/sub/style.css'),
+        S3Url(f's3://{s3_test_bucket.name}/site/sub/deep/data.json'),
+    )
+    assert_that(S3Url(f's3://{s3_test_bucket.name}/site/sub/deep/data.json').read_json()).is_equal_to({'a': 1})
+    assert_that(S3Url(f's3://{s3_test_bucket.name}/site/app.js').object.server_side_encryption) \
+        .is_equal_to('AES256')
+
+
+def test_upload_dir_include(s3_test_bucket, local_dir):
+    prefix = S3Url(f's3://{s3_test_bucket.name}/site/')
+    uploaded = prefix.upload_dir(local_dir, include=['sub/*'], exclude=['*.log'])
+    assert_that(uploaded).is_length(2).contains_only(
+        S3Url(f's3://{s3_test_bucket.name}/site/sub/style.css'),
+        S3Url(f's3://{s3_test_bucket.name}/site/sub/deep/data.json'),
+    )
+
+
+def test_upload_dir_skip_unchanged(s3_test_bucket, local_dir):
+    (local_dir / 'large.bin').write_bytes(os.urandom(6 * 1024 * 1024))
+    transfer_config = TransferConfig(multipart_threshold=5 * 1024 * 1024, multipart_chunksize=5 * 1024 * 1024)
+    prefix = S3Url(f's3://{s3_test_bucket.name}/site/')
+
+    assert_that(prefix.upload_dir(local_dir, skip_unchanged=True, transfer_config=transfer_config)).is_length(6)
+    assert_that(S3Url(f's3://{s3_test_bucket.name}/site/large.bin').object.e_tag).ends_with('-2"')
+    assert_that(prefix.upload_dir(local_dir, skip_unchanged=True, transfer_config=transfer_config)).is_empty()
+
+    (local_dir / 'app.js').write_text('console.log(2)')
+    assert_that(prefix.upload_dir(local_dir, skip_unchanged=True, transfer_config=transfer_config)) \
+        .is_equal_to([S3Url(f's3://{s3_test_bucket.name}/site/app.js')])
+
+
+def test_download_dir(s3_test_bucket, local_dir, tmp_path):
+    prefix = S3Url(f's3://{s3_test_bucket.name}/site/')
+    prefix.upload_dir(local_dir)
+    target = tmp_path / 'download'
+
+    downloaded = prefix.download_dir(target, max_workers=2, max_in_flight_bytes=10)
+
+    assert_that(downloaded).is_length(5)
+    assert_that(sorted(p.relative_to(target).as_posix() for p in target.rglob('*') if p.is_file())).is_equal_to(
+        sorted(p.relative_to(local_dir).as_posix() for p in local_dir.rglob('*') if p.is_file()))
+    assert_that((target / 'sub' / 'deep' / 'data.json').read_text()).is_equal_to('{"a": 1}')
+
+
+def test_download_dir_resume(s3_test_bucket, local_dir, tmp_path):
+    prefix = S3Url(f's3://{s3_test_bucket.name}/site/')
+    prefix.upload_dir(local_dir)
+    target = tmp_path / 'download'
+    prefix.download_dir(target)
+
+    assert_that(prefix.download_dir(target)).is_empty()
+
+    (target / 'app.js').write_text('corrupted')
+    (target / 'index.html').unlink()
+    assert_that(prefix.download_dir(target)).is_length(2).contains_only(target / 'app.js', target / 'index.html')
+    assert_that((target / 'app.js').read_text()).is_equal_to('console.log(1)')
+    assert_that(prefix.download_dir(target, skip_unchanged=False)).is_length(5)
+
+
+def test_download_dir_resume_multipart_with_other_part_size(s3_test_bucket, tmp_path):
+    source = tmp_path / 'source'
+    source.mkdir()
+    (source / 'big.bin').write_bytes(os.urandom(12 * 1024 * 1024))
+    prefix = S3Url(f's3://{s3_test_bucket.name}/large/')
+    mib = 1024 * 1024
+    prefix.upload_dir(source, transfer_config=TransferConfig(multipart_threshold=5 * mib, multipart_chunksize=5 * mib))
+    assert_that(S3Url(f's3://{s3_test_bucket.name}/large/big.bin').etag).ends_with('-3"')
+    target = tmp_path / 'download'
+
+    assert_that(prefix.download_dir(target)).is_length(1)
+    assert_that(prefix.download_dir(target)).is_empty()
+
+
+@pytest.mark.parametrize('codec', ['gzip', 'zstd'])
+def test_write_read_compressed(s3_test_bucket, codec):
+    url = S3Url(f's3://{s3_test_bucket.name}/compressed.json')
+    body = {'entries': ['value'] * 1000}
+
+    url.write_json(body, codec=codec, level=3)
+
+    assert_that(url.object.content_encoding).is_equal_to(codec)
+    assert_that(url.object.content_length).is_less_than(len(json.dumps(body)))
+    assert_that(url.read_json(codec='auto')).is_equal_to(body)
+    assert_that(url.read_json(codec=codec)).is_equal_to(body)
+    with url.open_read(codec='auto') as stream:
+        assert_that(stream.read(12)).is_equal_to(b'{"entries": ')
+
+
+@pytest.mark.parametrize('suffix,codec', [('.gz', 'gzip'), ('.zst', 'zstd')])
+def test_write_read_compressed_by_suffix(s3_test_bucket, suffix, codec):
+    url = S3Url(f's3://{s3_test_bucket.name}/compressed.txt{suffix}')
+
+    url.write_text('test data', codec='auto')
+
+    assert_that(url.object.content_encoding).is_none()
+    assert_that(url.read()).is_not_equal_to(b'test data')
+    assert_that(url.read_text(codec='auto')).is_equal_to('test data')
+    assert_that(url.read_text(codec=codec)).is_equal_to('test data')
+
+
+@pytest.mark.parametrize('suffix', ['.gz', '.zst'])
+def test_open_read_compressed_lines(s3_test_bucket, suffix):
+    url = S3Url(f's3://{s3_test_bucket.name}/compressed.jsonl{suffix}')
+    url.write_text('{"id": 1}\n{"id": 2}\n{"id": 3}\n', codec='auto')
+
+    with url.open_read(codec='auto') as stream:
+        assert_that(stream.readline()).is_equal_to(b'{"id": 1}\n')
+        assert_that([json.loads(line) for line in stream]).is_equal_to([{'id': 2}, {'id': 3}])
+
+
+@pytest.mark.parametrize('codec', ['gzip', 'zstd'])
+def test_upload_file_compressed(s3_test_bucket, codec):
+    url = S3Url(f's3://{s3_test_bucket.name}/some_new_file.json')
+    current_path = Path(__file__).resolve().parent
+    with (current_path / "resources" / "test_file.json").open(mode='rb') as fobj:
+        url.upload_file(fobj, encryption='AES256', codec=codec)
+    assert_that(url.read_json(codec='auto')).is_equal_to({
+        "testEntry1": "value1"
+    })
+    assert_that(url.object.server_side_encryption).is_equal_to('AES256')
+
+
+def test_unsupported_codec(s3_test_bucket):
+    url = S3Url(f's3://{s3_test_bucket.name}/some_new_file.json')
+    assert_that(url.write_text).raises(ValueError).when_called_with('test', codec='lzma')
+
+
+@pytest.fixture
+def select_objects(s3_test_bucket):
+    csv_url = S3Url(f's3://{s3_test_bucket.name}/select/people.csv')
+    csv_url.write_text("name,age,city\nann,30,Paris\nbob,25,London\ncarl,41,O'Hare\n")
+    jsonl_url = S3Url(f's3://{s3_test_bucket.name}/select/people.jsonl.gz')
+    jsonl_url.write_text('{"name": "ann", "age": 30}\n{"name": "bob", "age": 25}\n{"name": "carl", "age": 41}\n',
+                         codec='auto')
+    yield csv_url, jsonl_url
+
+
+def test_select_server_side(s3_test_bucket):
+    url = S3Url(f's3://{s3_test_bucket.name}/select/people.jsonl')
+    url.write_text('{"name": "ann", "age": 30}\n{"name": "bob", "age": 25}\n')
+    assert_that(list(url.select('SELECT s.name FROM s3object s'))).is_equal_to([{'name': 'ann'}, {'name': 'bob'}])
+
+
+def test_select_client_side(select_objects):
+    csv_url, jsonl_url = select_objects
+
+    assert_that(list(jsonl_url.select("SELECT s.name FROM S3Object s WHERE s.age > 26 LIMIT 1",
+                                      codec='auto', server_side=False))).is_equal_to([{'name': 'ann'}])
+    assert_that(list(csv_url.select("SELECT name, age FROM S3Object WHERE city = 'O''Hare' AND age >= 41",
+                                    input_format='csv', output_format='csv', server_side=False))) \
+        .is_equal_to([['carl', '41']])
+    assert_that(list(csv_url.select("SELECT s._1 FROM S3Object s WHERE s._3 <> 'Paris'",
+                                    input_format='csv', csv_header='IGNORE', server_side=False))) \
+        .is_equal_to([{'_1': 'bob'}, {'_1': 'carl'}])
+
+
+def test_select_falls_back_when_unavailable(select_objects, monkeypatch):
+    _, jsonl_url = select_objects
+    client = jsonl_url.object.meta.client
+
+    def raise_not_implemented(*args, **kwargs):
+        raise ClientError({'Error': {'Code': 'MethodNotAllowed', 'Message': 'Not allowed'}}, 'SelectObjectContent')
+
+    monkeypatch.setattr(client, 'select_object_content', raise_not_implemented)
+    assert_that(list(jsonl_url.select("SELECT * FROM S3Object s WHERE s.name = 'bob'", codec='gzip'))) \
+        .is_equal_to([{'name': 'bob', 'age': 25}])
+
+
+def test_select_invalid_arguments_fail_on_call(select_objects):
+    csv_url, _ = select_objects
+    assert_that(csv_url.select).raises(ValueError).when_called_with('SELECT * FROM S3Object', input_format='xml')
+    assert_that(csv_url.select).raises(ValueError).when_called_with('SELECT * FROM S3Object', csv_header='FIRST')
+    assert_that(csv_url.select).raises(ValueError).when_called_with(
+        "SELECT COUNT(*) FROM S3Object s WHERE s.age > 1 OR s.age < 1", server_side=False)
+    assert_that(csv_url.select).raises(ValueError).when_called_with('SELECT COUNT(*) FROM S3Object', server_side=False)
+    assert_that(csv_url.select).raises(ValueError).when_called_with('SELECT s.name AS n FROM S3Object s',
+                                                                    server_side=False)
+
+
+def test_select_csv_output_keeps_column_positions(s3_test_bucket):
+    url = S3Url(f's3://{s3_test_bucket.name}/select/partial.jsonl')
+    url.write_text('{"name": "ann", "age": 30}\n{"age": 41}\n')
+    assert_that(list(url.select('SELECT name, age FROM S3Object', output_format='csv', server_side=False))) \
+        .is_equal_to([['ann', 30], ['', 41]])
+
+
+def test_select_server_side_csv_with_newlines(s3_test_bucket, monkeypatch):
+    url = S3Url(f's3://{s3_test_bucket.name}/select/notes.csv')
+    url.write_text('name,note\n')
+    events = [{'Records': {'Payload': b'ann,"line 1\nli'}}, {'Records': {'Payload': b'ne 2"\nbob,ok\n'}}, {'End': {}}]
+    monkeypatch.setattr(url.object.meta.client, 'select_object_content', lambda **kwargs: {'Payload': events})
+    assert_that(list(url.select('SELECT * FROM S3Object', input_format='csv', output_format='csv'))) \
+        .is_equal_to([['ann', 'line 1\nline 2'], ['bob', 'ok']])
+
+
+def test_select_auto_codec_from_suffix_without_head(select_objects, monkeypatch):
+    _, jsonl_url = select_objects
+    client = jsonl_url.object.meta.client
+
+    def no_head(*args, **kwargs):
+        raise AssertionError('unexpected HeadObject')
+
+    monkeypatch.setattr(client, 'head_object', no_head)
+    assert_that(list(jsonl_url.select("SELECT * FROM S3Object s WHERE s.age < 26", codec='auto',
+                                      server_side=False))).is_equal_to([{'name': 'bob', 'age': 25}])
+
+
+def test_write_with_tags(s3_test_bucket):
+    url = S3Url(f's3://{s3_test_bucket.name}/tagged.json')
+    url.write_json({'a': 1}, tags={'tag1': 'value 1', 'tag2': 'a+b=c'})
+    assert_that(url).has_s3_tags_equal_to({'tag1': 'value 1', 'tag2': 'a+b=c'})
+
+
+def test_write_skip_unchanged(s3_test_bucket, monkeypatch):
+    url = S3Url(f's3://{s3_test_bucket.name}/dedup.json')
+
+    assert_that(url.write_json({'a': 1}, skip_unchanged=True)).is_true()
+    assert_that(url.write_json({'a': 1}, skip_unchanged=True)).is_false()
+    assert_that(url.write_json({'a': 2}, skip_unchanged=True)).is_true()
+    assert_that(url.read_json()).is_equal_to({'a': 2})
+    assert_that(url.write_json({'a': 2}, codec='gzip', skip_unchanged=True)).is_true()
+    assert_that(url.write_json({'a': 2}, codec='gzip', skip_unchanged=True)).is_false()
+    assert_that(url.read_json(codec='auto')).is_equal_to({'a': 2})
+
+    # no additional HEAD when object metadata is already loaded
+    url.object.load()
+    monkeypatch.setattr(url.object.meta.client, 'head_object', None)
+    assert_that(url.write_json({'a': 2}, codec='gzip', skip_unchanged=True)).is_false()
+
+
+def test_write_skip_unchanged_sends_content_md5(s3_test_bucket, monkeypatch):
+    url = S3Url(f's3://{s3_test_bucket.name}/dedup.txt')
+    put_args = {}
+    original_put = url.object.put
+
+    def put(**kwargs):
+        put_args.update(kwargs)
+        return original_put(**kwargs)
+
+    monkeypatch.setattr(url.object, 'put', put)
+    url.write_text('test', skip_unchanged=True)
+    assert_that(put_args).contains_entry({'ContentMD5': 'CY9rzUYh03PK3k6DJie09g=='})
+
+
+def test_upload_file_skip_unchanged(s3_test_bucket):
+    url = S3Url(f's3://{s3_test_bucket.name}/dedup.bin')
+    small = b'small content'
+    large = os.urandom(9 * 1024 * 1024)
+
+    assert_that(url.upload_file(io.BytesIO(small), skip_unchanged=True)).is_true()
+    assert_that(url.upload_file(io.BytesIO(small), skip_unchanged=True)).is_false()
+
+    assert_that(url.upload_file(io.BytesIO(large), skip_unchanged=True)).is_true()
+    assert_that(url.object.e_tag).ends_with('-2"')
+    assert_that(url.upload_file(io.BytesIO(large), skip_unchanged=True)).is_false()
+    assert_that(url.upload_file(io.BytesIO(large), codec='gzip', skip_unchanged=True)).is_true()
+    assert_that(url.upload_file(io.BytesIO(large), codec='gzip', skip_unchanged=True)).is_false()
+    assert_that(url.read(codec='auto')).is_equal_to(large)
+
+
+def test_list_prefix_objects_metadata(s3_test_bucket):
+    S3Url(f's3://{s3_test_bucket.name}/some_prefix/some_file_1.txt').write_text("123")
+    listed = list(S3Url(f's3://{s3_test_bucket.name}/some_prefix/').list_prefix_objects())[0]
+    url = S3Url(f's3://{s3_test_bucket.name}/some_prefix/some_file_1.txt')
+
+    assert_that(listed.size).is_equal_to(3).is_equal_to(url.size)
+    assert_that(listed.etag).is_equal_to(url.etag)
+    assert_that(listed.storage_class).is_equal_to('STANDARD').is_equal_to(url.storage_class)
+    assert_that(listed.last_modified).is_equal_to(url.last_modified)
+
+
+def test_delete_dir_batches(s3_test_bucket):
+    for i in range(1005):
+        s3_test_bucket.put_object(Key=f'batch/{i}.txt', Body=b'1')
+    S3Url(f's3://{s3_test_bucket.name}/batch/').delete_dir()
+    assert_that(S3Url(f's3://{s3_test_bucket.name}/batch/').prefix_exists()).is_false()
@@ -0,0 +1,67 @@
+from concurrent.futures import wait
+
+import pytest
+from assertpy import assert_that
+from botocore.exceptions import ClientError
+
+from s3_url import S3Url, S3Writer
+
+
+def test_writer_writes_objects(s3_test_bucket):
+    with S3Writer(max_workers=4, max_queue_size=2) as writer:
+        futures = [writer.write_json(f's3://{s3_test_bucket.name}/events/{i}.json', {'id': i}, tags={'type': 'event'})
+                   for i in range(20)]
+        futures.append(writer.write_text(f's3://{s3_test_bucket.name}/events/text.txt', 'text'))
+
+    assert_that([f.result() for f in futures[:3]]).is_equal_to([
+        S3Url(f's3://{s3_test_bucket.name}/events/{i}.json') for i in range(3)])
+    assert_that(list(S3Url(f's3://{s3_test_bucket.name}/events/').list_prefix_objects())).is_length(21)
+    assert_that(S3Url(f's3://{s3_test_bucket.name}/events/7.json').read_json()).is_equal_to({'id': 7})
+    assert_that(f's3://{s3_test_bucket.name}/events/7.json').has_s3_tags_equal_to({'type': 'event'})
+    assert_that(S3Url(f's3://{s3_test_bucket.name}/events/text.txt').read_text()).is_equal_to('text')
+
+
+def test_writer_serializes_json_on_call(s3_test_bucket):
+    body = {'state': 'queued'}
+    with S3Writer() as writer:
+        writer.write_json(f's3://{s3_test_bucket.name}/state.json', body)
+        body['state'] = 'changed'
+    assert_that(S3Url(f's3://{s3_test_bucket.name}/state.json').read_json()).is_equal_to({'state': 'queued'})
+
+
+def test_writer_write_tags(s3_test_bucket, s3_test_file):
+    writer = S3Writer()
+    writer.write_tags(f's3://{s3_test_bucket.name}/{s3_test_file}', {'tag1': 'value1'})
+    writer.flush()
+    assert_that(f's3://{s3_test_bucket.name}/{s3_test_file}').has_s3_tags_equal_to({'tag1': 'value1'})
+    writer.close()
+
+
+def test_writer_flush_raises_write_error(s3_test_bucket):
+    writer = S3Writer()
+    future = writer.write('s3://non-existing-bucket/file.txt', 'text')
+    with pytest.raises(ClientError):
+        writer.flush()
+    assert_that(future.exception()).is_instance_of(ClientError)
+
+
+def test_writer_flush_raises_error_of_completed_write(s3_test_bucket):
+    writer = S3Writer()
+    future = writer.write('s3://non-existing-bucket/file.txt', 'text')
+    wait([future])
+    assert_that(future.done()).is_true()
+    with pytest.raises(ClientError):
+        writer.flush()
+    # error is reported once
+    writer.flush()
+
+    with pytest.raises(ClientError):
+        with S3Writer() as writer:
+            wait([writer.write('s3://non-existing-bucket/file.txt', 'text')])
+
+
+def test_write_async(s3_test_bucket):
+    url = S3Url(f's3://{s3_test_bucket.name}/async.txt')
+    assert_that(url.write_async('async text', tags={'tag1': 'value1'}).result()).is_equal_to(url)
+    assert_that(url.read_text()).is_equal_to('async text')
+    assert_that(url).has_s3_tags_equal_to({'tag1': 'value1'})
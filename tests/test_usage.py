@@ -0,0 +1,79 @@
+import json
+
+from assertpy import assert_that
+
+from s3_url import S3Url, usage_report
+
+
+def write_tree(bucket):
+    files = {
+        'usage/root.txt': 10,
+        'usage/a/1.txt': 1,
+        'usage/a/2.txt': 2,
+        'usage/a/deep/3.txt': 3,
+        'usage/b/4.txt': 4,
+        'usage/b/deep/er/5.txt': 5,
+    }
+    for key, size in files.items():
+        bucket.put_object(Key=key, Body=b'x' * size)
+    S3Url(f's3://{bucket.name}/usage/b/4.txt').transition_to_storage_tier('GLACIER')
+
+
+def by_prefix(usages) -> dict:
+    return {usage.prefix: usage for usage in usages}
+
+
+def test_usage_by_depth(s3_test_bucket):
+    write_tree(s3_test_bucket)
+    prefix = S3Url(f's3://{s3_test_bucket.name}/usage/')
+
+    total = list(prefix.usage(depth=0))
+    assert_that(total).is_length(1)
+    assert_that(total[0].objects).is_equal_to(6)
+    assert_that(total[0].size).is_equal_to(25)
+    assert_that(total[0].storage_classes).is_equal_to({'STANDARD': {'objects': 5, 'size': 21},
+                                                       'GLACIER': {'objects': 1, 'size': 4}})
+    assert_that(total[0].oldest).is_less_than_or_equal_to(total[0].newest)
+
+    usages = by_prefix(prefix.usage(depth=1, max_workers=2))
+    assert_that(usages).is_length(3)
+    assert_that(usages[f's3://{s3_test_bucket.name}/usage/'].objects).is_equal_to(1)
+    assert_that(usages[f's3://{s3_test_bucket.name}/usage/a/'].size).is_equal_to(6)
+    assert_that(usages[f's3://{s3_test_bucket.name}/usage/b/'].storage_classes['GLACIER']['size']).is_equal_to(4)
+
+    usages = by_prefix(prefix.usage(depth=2))
+    assert_that(sorted(usages)).is_equal_to([
+        f's3://{s3_test_bucket.name}/usage/',
+        f's3://{s3_test_bucket.name}/usage/a/',
+        f's3://{s3_test_bucket.name}/usage/a/deep/',
+        f's3://{s3_test_bucket.name}/usage/b/',
+        f's3://{s3_test_bucket.name}/usage/b/deep/',
+    ])
+    assert_that(sum(usage.size for usage in usages.values())).is_equal_to(25)
+    assert_that(usages[f's3://{s3_test_bucket.name}/usage/b/deep/'].size).is_equal_to(5)
+
+
+def test_usage_prefix_without_trailing_slash(s3_test_bucket):
+    write_tree(s3_test_bucket)
+    assert_that(sorted(by_prefix(S3Url(f's3://{s3_test_bucket.name}/usage').usage(depth=1)))).is_equal_to([
+        f's3://{s3_test_bucket.name}/usage/',
+        f's3://{s3_test_bucket.name}/usage/a/',
+        f's3://{s3_test_bucket.name}/usage/b/',
+    ])
+
+
+def test_usage_empty_prefix(s3_test_bucket):
+    assert_that(list(S3Url(f's3://{s3_test_bucket.name}/non-existing/').usage(depth=3))).is_empty()
+
+
+def test_usage_report(s3_test_bucket):
+    write_tree(s3_test_bucket)
+    prefix = S3Url(f's3://{s3_test_bucket.name}/usage/')
+
+    report = usage_report(prefix.usage(depth=1))
+
+    assert_that(report).is_equal_to(usage_report(prefix.usage(depth=1, max_workers=1)))
+    rows = [json.loads(line) for line in report.splitlines()]
+    assert_that([row['prefix'] for row in rows]).is_sorted()
+    assert_that(rows[1]).contains_entry({'prefix': f's3://{s3_test_bucket.name}/usage/a/'}, {'objects': 3},
+                                        {'size': 6})